@@ -1,8 +1,9 @@
 import streamlit as st
-import glob
-import pandas as pd
 import plotly.express as px
-from scripts.summarizer import load_summarizer, summarize_comments, classify_sentiment
+from scripts.summarizer import load_summarizer, summarize_comments, classify_sentiment, SummaryCache
+from scripts.data_store import top_comments, timeline_series, stored_seasons
+from scripts.shared_snapshot import SharedSnapshots
+from scripts.seasons import get_season, season_key
 
 st.set_page_config(
     page_title="Love Island Sentiment",  
@@ -10,30 +11,33 @@ st.set_page_config(
     layout="wide"
 )
 
+# Season picker: every show / season with data in the store, newest first
+seasons = sorted(stored_seasons(), key=lambda pair: (pair[0], -pair[1]))
+show, season = st.sidebar.selectbox("Season", seasons, format_func=lambda pair: get_season(*pair)['title'])
+season_info = get_season(show, season)
+
 # Title
-st.markdown("<h1 style='text-align: center; color: Black;'>🏝️Love Island USA - Islander Breakdown🏝️</h1>", unsafe_allow_html=True)
-st.markdown("<h6 style='text-align: center; color: gray;'>Analysing Reddit Sentiment of Love Island USA Season 7</h6>", unsafe_allow_html=True)
+st.markdown(f"<h1 style='text-align: center; color: Black;'>🏝️{season_info['show_name']} - Islander Breakdown🏝️</h1>", unsafe_allow_html=True)
+st.markdown(f"<h6 style='text-align: center; color: gray;'>Analysing Reddit Sentiment of {season_info['title']}</h6>", unsafe_allow_html=True)
 
-# Load the data
-parquet_files = glob.glob("data/comment_updates/*.parquet")
-df = pd.concat([pd.read_parquet(f) for f in parquet_files], ignore_index=True)
+# One read-only, memory-mapped copy of the season's tables for the whole server, shared by every session.
+# It is swapped for a fresh one when a new manifest version is deployed; reruns only take zero-copy slices.
+@st.cache_resource(show_spinner=False)
+def shared_snapshots():
+    return SharedSnapshots()
 
-# Convert AirDate to datetime
-df["airdate"] = pd.to_datetime(df["airdate"])
+snapshot = shared_snapshots().get(show, season)
 
 tab1, tab2 = st.tabs(['Dashboard','Info'])
 
 with tab1:
     # Sidebar: Select islander
-    islanders = sorted(df["islander"].unique())
+    islanders = snapshot.islanders
     selected_islander = st.selectbox("Choose an Islander", islanders)
 
-    # Filter for selected islander and group by episode
-    filtered = df[df["islander"] == selected_islander]
+    # Per-episode stats are precomputed by the pipeline; this is a lookup, not a groupby
     grouped = (
-        filtered.groupby(["episode_num", "airdate"])
-        .agg(avg_sentiment=("sentiment", "mean"))
-        .reset_index()
+        snapshot.slice('aggregates', selected_islander).to_pandas()
         .sort_values("airdate")
         .assign(
             sentiment_classification = lambda x: x.avg_sentiment.apply(classify_sentiment)
@@ -53,7 +57,7 @@ with tab1:
             st.metric(label='Average Sentiment', value=sentiment_label)
 
     with col3:
-        comment_count = len(filtered['sentiment'])
+        comment_count = int(grouped['comment_count'].sum())
         with st.container(border=True):
             st.metric(label='Total Comments', value=comment_count)
 
@@ -76,25 +80,69 @@ with tab1:
     # Show chart
     st.plotly_chart(fig, use_container_width=True)
 
+    # Reaction timeline: how sentiment moves in the hours after an episode airs
+    st.markdown(f"<h2 style='text-align: center; color: Black;'>Reaction Timeline: {selected_islander}</h2>", unsafe_allow_html=True)
+
+    timeline_col1, timeline_col2 = st.columns(2)
+    with timeline_col1:
+        episodes = grouped['episode_num'].to_list()
+        timeline_episode = st.selectbox("Episode", episodes[::-1])
+    with timeline_col2:
+        bucket_labels = {15: "15 minutes", 60: "1 hour"}
+        bucket_minutes = st.radio("Bucket size", list(bucket_labels), format_func=bucket_labels.get, horizontal=True)
+
+    buckets = snapshot.slice('timeline', selected_islander, timeline_episode, bucket_minutes)
+    if buckets.num_rows == 0:
+        st.info("No comments about this islander in the 48 hours after this episode aired.")
+    else:
+        timeline_fig = px.line(
+            timeline_series(buckets.to_pandas()),
+            x="hours_after_air",
+            y="avg_sentiment",
+            markers=True,
+            hover_data=["comment_count"],
+            title=f"Sentiment After Episode {timeline_episode} Aired: {selected_islander}",
+            labels={
+                "hours_after_air": "Hours After Airing",
+                "avg_sentiment": "Average Sentiment",
+                "comment_count": "Comments"
+            },
+            range_y=[-1, 1]
+        )
+        timeline_fig.add_hline(y=0, line_dash="dash", line_color="gray", annotation_text="Neutral", annotation_position="bottom right")
+        st.plotly_chart(timeline_fig, use_container_width=True)
+
     # Summarizer
     st.markdown(f"<h2 style='text-align: center; color: Black;'>What are people saying about {selected_islander}?</h2>", unsafe_allow_html=True)
 
     summarizer = load_summarizer()
+    # Shared with the daily job, which pre-generates every islander's summary
+    summary_cache = SummaryCache()
+    latest_episode = snapshot.latest_episode
+
+    first_episode, last_episode = int(grouped['episode_num'].min()), int(grouped['episode_num'].max())
+    episode_range = (first_episode, last_episode)
+    if first_episode < last_episode:
+        episode_range = st.slider("Episodes to summarize", first_episode, last_episode, (first_episode, last_episode))
 
-    comments_df = df[df['islander'] == selected_islander][['comment', 'score']]
+    comments_df = top_comments(
+        snapshot.slice('top_comments', selected_islander).to_pandas(), selected_islander, episode_range
+    )[['comment', 'score']]
 
     if st.button('Summarize Comments'):
         with st.spinner('Summarizing Reddit Comments...'):
-            st.write(summarize_comments(comments_df, summarizer,selected_islander))
+            st.write(summarize_comments(
+                comments_df, summarizer, selected_islander, latest_episode, summary_cache, season_key(show, season)
+            ))
 
 
 with tab2:
-    st.markdown("""
+    st.markdown(f"""
 ## ℹ️ About This Dashboard
 
 ### 📊 What is a Sentiment Score?
 
-Each Reddit comment about a Love Island USA contestant is analyzed to measure its **sentiment** — the emotional tone of the message.  
+Each Reddit comment about a {season_info['show_name']} contestant is analyzed to measure its **sentiment** — the emotional tone of the message.  
 The sentiment score ranges from **-1 to 1**:
 
 - **+1** → Very positive (e.g., admiration, excitement)
@@ -107,13 +155,13 @@ For each islander, sentiment scores are averaged by episode to track how public
 
 ### 🔍 How Was the Data Collected?
 
-The comments were collected from **official Reddit discussion threads** for each episode of **Love Island USA Season 7**.  
+The comments were collected from **official Reddit discussion threads** for each episode of **{season_info['title']}**.  
 Using the **Reddit API**, the app pulls comments that mention each islander by name.
 
 All comments were cleaned and filtered to remove:
-- Spam
+- Spam (deleted or removed comments, bot posts, link-only and repetitive comments)
 - Irrelevant discussions
-- Duplicates
+- Duplicates (copy-pasted and near-identical comments)
 
 This ensures that the sentiment analysis focuses only on meaningful feedback from the community.
 
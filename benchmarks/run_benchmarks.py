@@ -0,0 +1,377 @@
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import platform
+import statistics
+import shutil
+import tempfile
+import subprocess
+import ast
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+# Offline by design: models come from the local Hugging Face cache and Wikipedia is never queried
+os.environ.setdefault("LI_OFFLINE", "1")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+# shared_snapshot is imported by app.py as scripts.shared_snapshot
+sys.path.insert(0, REPO_ROOT)
+
+from initial_sentiment import (
+    segment_comments, score_batches, batch_targeted_mentions, reshape_mentions, sentiment_dicts_to_mentions,
+    extract_episode_number
+)
+from name_matcher import build_name_index
+from seasons import get_season
+from comment_filter import CommentFilter
+from data_store import (
+    load_store, read_aggregates, compute_aggregates, read_top_comments, top_comments, read_timeline, timeline_series,
+    manifest_version
+)
+from scripts.shared_snapshot import SNAPSHOT_TABLES, SharedSnapshots, write_snapshot
+
+RAW_FOLDER = os.path.join(REPO_ROOT, "data/season7_comments")
+LI_FULL_PATH = os.path.join(REPO_ROOT, "data/li_full.parquet")
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks/results")
+COMMENT_KEY = ['episode_post_id', 'comment', 'created_utc']
+
+
+def timed(fn, repeat):
+    # Returns the last result plus per-run wall times
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        seconds.append(time.perf_counter() - start)
+    return result, {'median_s': statistics.median(seconds), 'min_s': min(seconds), 'runs': seconds}
+
+
+def git_revision():
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    return {'commit': git('rev-parse', '--short', 'HEAD') or 'unknown', 'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+
+
+def load_raw_comments():
+    return pd.concat(
+        [pd.read_parquet(path) for path in sorted(glob.glob(f"{RAW_FOLDER}/*_comments.parquet"))],
+        ignore_index=True
+    )
+
+
+def offline_metadata(li_full):
+    # Islander names and airdates as they were when li_full was scored, so nothing touches the network
+    islanders = li_full['islander'].drop_duplicates().to_list()
+    episode_airdates = (
+        li_full[['episode_num', 'AirDate']]
+        .drop_duplicates('episode_num')
+        .rename(columns={'AirDate': 'airdate'})
+        .assign(airdate=lambda x: pd.to_datetime(x.airdate))
+    )
+    return islanders, episode_airdates
+
+
+def scored_frame_from_li_full(li_full):
+    # Rebuilds the scorer's per-comment {islander: sentiment} frame from li_full's long rows.
+    # Rows of one comment are consecutive; a new key or a repeated islander starts the next comment.
+    records = []
+    previous_key, current = None, None
+    for row in li_full.itertuples(index=False):
+        key = (row.episode_post_id, row.comment, row.created_utc)
+        if current is None or key != previous_key or row.islander in current['islander_sentiment']:
+            current = {
+                'comment': row.comment,
+                'score': row.score,
+                'created_utc': row.created_utc,
+                'episode_post_id': row.episode_post_id,
+                'episode_title': row.episode_title,
+                'islander_sentiment': {}
+            }
+            records.append(current)
+            previous_key = key
+        current['islander_sentiment'][row.islander] = row.sentiment
+    return pd.DataFrame(records)
+
+
+def baseline_reshape_sentiment(scored, episode_airdates):
+    # The per-row explode reshape the pipeline used before reshape_mentions, kept here as the reference
+    return (
+        scored
+        .assign(
+            islander_sentiment=lambda df: df['islander_sentiment'].apply(
+                lambda x: ast.literal_eval(x) if isinstance(x, str) else x
+            )
+        )
+        .loc[lambda df: df['islander_sentiment'].apply(lambda x: isinstance(x, dict) and len(x) > 0)]
+        .assign(
+            islander_sentiment_items=lambda df: df['islander_sentiment'].apply(lambda d: list(d.items()))
+        )
+        .explode('islander_sentiment_items')
+        .assign(
+            islander=lambda df: df['islander_sentiment_items'].apply(lambda x: x[0]),
+            sentiment=lambda df: df['islander_sentiment_items'].apply(lambda x: x[1])
+        )
+        .drop(columns=['islander_sentiment_items'])
+        .assign(
+            episode_num=lambda x: x.episode_title.apply(extract_episode_number)
+        )
+        .merge(episode_airdates[['episode_num', 'airdate']], on='episode_num', how='left')
+    )
+
+
+def bench_reshape(li_full, episode_airdates, repeat):
+    # Both reshapes run on the same scored input; the new one must reproduce the baseline row for row
+    scored = scored_frame_from_li_full(li_full)
+    expected, baseline = timed(lambda: baseline_reshape_sentiment(scored, episode_airdates), repeat)
+    # Timed from the scorer's long-format output, which is what the pipeline hands to the reshape
+    mentions = sentiment_dicts_to_mentions(scored['islander_sentiment'])
+    comments = scored.drop(columns=['islander_sentiment'])
+    reshaped, timing = timed(lambda: reshape_mentions(comments, mentions, episode_airdates), repeat)
+
+    columns = COMMENT_KEY + ['islander', 'sentiment', 'episode_num', 'airdate']
+    expected = expected[columns].reset_index(drop=True).astype({'sentiment': float, 'episode_num': float})
+    actual = reshaped[columns].reset_index(drop=True).astype({'sentiment': float, 'episode_num': float})
+    try:
+        pd.testing.assert_frame_equal(expected, actual, check_exact=False, rtol=0, atol=1e-12)
+        equivalent = True
+    except AssertionError as e:
+        print(f"❌ reshape_mentions differs from the baseline reshape: {e}")
+        equivalent = False
+    return {
+        **timing,
+        'baseline_median_s': baseline['median_s'],
+        'speedup': baseline['median_s'] / timing['median_s'],
+        'comments': len(scored),
+        'rows': len(reshaped),
+        'equivalent_to_baseline': equivalent
+    }
+
+
+def bench_comment_filter(raw, repeat, batch_size=2000):
+    # Fresh filter per run, fed in pipeline-sized batches like stream_sentiment does
+    def run():
+        comment_filter = CommentFilter()
+        return pd.concat(
+            [comment_filter.reasons(raw.iloc[start:start + batch_size]) for start in range(0, len(raw), batch_size)]
+        )
+
+    reasons, timing = timed(run, repeat)
+    return {
+        **timing,
+        'comments': len(raw),
+        'comments_per_s': len(raw) / timing['median_s'],
+        'filtered': {reason: int(n) for reason, n in reasons.value_counts().items()}
+    }
+
+
+def bench_name_matching(islanders, comment_chunks, repeat):
+    chunks = [chunk for chunks in comment_chunks for chunk in chunks]
+    name_index, build = timed(lambda: build_name_index(islanders, get_season('usa', 7)['aliases']), repeat)
+    matched, timing = timed(lambda: [chunk for chunk in chunks if name_index.find(chunk)], repeat)
+    return {**timing, 'build_median_s': build['median_s'], 'chunks': len(chunks), 'matched_chunks': len(matched)}, matched
+
+
+def bench_scoring(chunks, backends, batch_sizes, repeat):
+    from inference_backends import TorchBackend, load_backend, compare_backends
+    from model_registry import MODEL_ID, get_model, get_tokenizer
+
+    results = []
+    for backend_name in backends:
+        backend = load_backend(backend_name, get_model(), MODEL_ID)
+        # Quantized/exported backends are only worth their speed if they still agree with fp32 torch
+        accuracy = None
+        if backend.name != 'torch':
+            accuracy = compare_backends(TorchBackend(get_model()), backend, get_tokenizer(), chunks)
+            print(
+                f"🎯 {accuracy['backend']} vs fp32 on {accuracy['chunks']} chunks: "
+                f"mean |Δ| {accuracy['mean_abs_diff']:.4f}, p99 |Δ| {accuracy['p99_abs_diff']:.4f}, "
+                f"max |Δ| {accuracy['max_abs_diff']:.4f}, label agreement {accuracy['label_agreement']:.1%}"
+            )
+        for batch_size in batch_sizes:
+            _, timing = timed(lambda: score_batches(chunks, batch_size=batch_size, backend=backend), repeat)
+            results.append({
+                'backend': backend.name,
+                'batch_size': batch_size,
+                **timing,
+                'chunks': len(chunks),
+                'chunks_per_s': len(chunks) / timing['median_s'],
+                'accuracy': accuracy
+            })
+    return results
+
+
+def bench_pipeline_equivalence(sample, li_full, islanders, episode_airdates, atol, mean_atol, count_rtol):
+    # Full scorer on raw comments vs the rows li_full holds for the same comments.
+    # Segmentation and name matching have changed since li_full was scored, so single rows may differ;
+    # what the dashboard shows must not: every (islander, episode) group has to stay within
+    # |mean difference| <= mean_atol and |count difference| <= max(1, count_rtol * expected count).
+    name_index = build_name_index(islanders, get_season('usa', 7)['aliases'])
+    reshaped = reshape_mentions(sample, batch_targeted_mentions(sample.comment, name_index), episode_airdates)
+    expected = li_full.merge(sample[COMMENT_KEY].drop_duplicates(), on=COMMENT_KEY)
+    merged = expected.merge(reshaped, on=COMMENT_KEY + ['islander'], how='outer', suffixes=('_expected', '_actual'), indicator=True)
+    both = merged[merged['_merge'] == 'both']
+    diff = (both['sentiment_expected'] - both['sentiment_actual']).abs()
+
+    group = ['islander', 'episode_num']
+    groups = (
+        expected.groupby(group)['sentiment'].agg(['mean', 'count'])
+        .join(reshaped.groupby(group)['sentiment'].agg(['mean', 'count']), how='outer', lsuffix='_expected', rsuffix='_actual')
+        .fillna({'count_expected': 0, 'count_actual': 0})
+    )
+    mean_diff = (groups['mean_expected'] - groups['mean_actual']).abs()
+    count_diff = (groups['count_expected'] - groups['count_actual']).abs()
+    # A group missing on one side has no mean to compare; its count difference still has to fit
+    group_ok = (mean_diff.isna() | (mean_diff <= mean_atol)) & (count_diff <= np.maximum(1, count_rtol * groups['count_expected']))
+    return {
+        'comments': len(sample),
+        'expected_rows': len(expected),
+        'actual_rows': len(reshaped),
+        'shared_rows': len(both),
+        'only_in_li_full': int((merged['_merge'] == 'left_only').sum()),
+        'only_in_pipeline': int((merged['_merge'] == 'right_only').sum()),
+        'mean_abs_diff': float(diff.mean()) if len(diff) else None,
+        'max_abs_diff': float(diff.max()) if len(diff) else None,
+        'within_atol': float((diff <= atol).mean()) if len(diff) else None,
+        'groups': len(groups),
+        'max_group_mean_diff': float(mean_diff.max()) if mean_diff.notna().any() else None,
+        'max_group_count_diff': int(count_diff.max()) if len(groups) else None,
+        'groups_outside_tolerance': groups[~group_ok].reset_index().to_dict('records'),
+        'within_tolerance': bool(group_ok.all())
+    }
+
+
+def bench_dashboard(repeat):
+    results = {}
+    _, results['manifest_version'] = timed(manifest_version, repeat)
+    df, results['load_store'] = timed(lambda: load_store(show='usa', season=7), repeat)
+    _, results['read_aggregates'] = timed(lambda: read_aggregates(show='usa', season=7), repeat)
+    # The groupby the dashboard used to run on every load, for comparison with the precomputed table
+    _, results['compute_aggregates'] = timed(lambda: compute_aggregates(df, 'usa', 7), repeat)
+    index, results['read_top_comments'] = timed(lambda: read_top_comments(show='usa', season=7), repeat)
+    _, results['top_comments_all_islanders'] = timed(
+        lambda: [top_comments(index, islander) for islander in index['islander'].unique()], repeat
+    )
+    timeline, results['read_timeline'] = timed(lambda: read_timeline(show='usa', season=7), repeat)
+    _, results['timeline_series'] = timed(lambda: timeline_series(timeline), repeat)
+    results['rows'] = len(df)
+    return results
+
+
+def bench_snapshot(repeat):
+    # Built in a scratch directory so the dashboard's live snapshots are left alone
+    results = {}
+    version = manifest_version()
+    snapshot_dir = tempfile.mkdtemp(prefix="snapshots-")
+    try:
+        def build():
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            return write_snapshot(version, 'usa', 7, snapshot_dir=snapshot_dir)
+
+        _, results['build'] = timed(build, repeat)
+
+        def cold_get():
+            # New holder over files already on disk: memory-maps them and computes the slice offsets
+            return SharedSnapshots(snapshot_dir=snapshot_dir).get('usa', 7)
+
+        snapshot, results['cold_get'] = timed(cold_get, repeat)
+        snapshots = SharedSnapshots(snapshot_dir=snapshot_dir)
+        snapshots.get('usa', 7)
+        _, results['warm_get'] = timed(lambda: snapshots.get('usa', 7), repeat)
+
+        for name in SNAPSHOT_TABLES:
+            keys = list(snapshot.offsets[name])
+            _, timing = timed(lambda: [snapshot.slice(name, *key) for key in keys], repeat)
+            results[f"slice_{name}"] = {**timing, 'slices': len(keys), 'per_slice_us': timing['median_s'] / max(1, len(keys)) * 1e6}
+        results['version'] = version
+    finally:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+    return results
+
+
+def run_stage(results, name, fn):
+    # Stages needing models or spaCy are recorded as skipped when those are not installed / cached
+    try:
+        results[name] = fn()
+    except (ImportError, OSError) as e:
+        results[name] = {'skipped': f"{type(e).__name__}: {e}"}
+        print(f"⏭️ Skipped {name}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks over the committed season 7 data")
+    parser.add_argument('--sample', type=int, default=2000, help="raw comments used for segmentation, matching and scoring")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--backends', nargs='+', default=['torch'])
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[16, 64, 128])
+    parser.add_argument('--atol', type=float, default=1e-4)
+    parser.add_argument('--mean-atol', type=float, default=0.05, help="allowed per-(islander, episode) mean difference")
+    parser.add_argument('--count-rtol', type=float, default=0.1, help="allowed relative per-(islander, episode) count difference")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', default=None, help="defaults to benchmarks/results/<commit>.json")
+    args = parser.parse_args()
+
+    li_full = pd.read_parquet(LI_FULL_PATH)
+    islanders, episode_airdates = offline_metadata(li_full)
+    raw = load_raw_comments()
+    # li_full covers the first scored episodes, so equivalence samples come from those threads only
+    sample = (
+        raw[raw['episode_post_id'].isin(li_full['episode_post_id'].unique())]
+        .dropna(subset=['comment'])
+        .sample(args.sample, random_state=args.seed)
+        .reset_index(drop=True)
+    )
+
+    revision = git_revision()
+    results = {
+        **revision,
+        'timestamp': dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'params': vars(args)
+    }
+
+    os.chdir(REPO_ROOT)
+    run_stage(results, 'reshape', lambda: bench_reshape(li_full, episode_airdates, args.repeat))
+    run_stage(results, 'dashboard', lambda: bench_dashboard(args.repeat))
+    run_stage(results, 'snapshot', lambda: bench_snapshot(args.repeat))
+    run_stage(results, 'comment_filter', lambda: bench_comment_filter(raw, args.repeat))
+
+    segmented = {}
+
+    def segmentation():
+        segmented['chunks'], timing = timed(lambda: segment_comments(sample.comment), args.repeat)
+        return {**timing, 'comments': len(sample), 'comments_per_s': len(sample) / timing['median_s']}
+
+    run_stage(results, 'segmentation', segmentation)
+    if 'chunks' in segmented:
+        matching, matched = bench_name_matching(islanders, segmented['chunks'], args.repeat)
+        results['name_matching'] = matching
+        unique_chunks = list(dict.fromkeys(matched))
+        run_stage(results, 'scoring', lambda: bench_scoring(unique_chunks, args.backends, args.batch_sizes, args.repeat))
+        run_stage(results, 'pipeline_equivalence',
+                  lambda: bench_pipeline_equivalence(
+                      sample, li_full, islanders, episode_airdates, args.atol, args.mean_atol, args.count_rtol
+                  ))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{revision['commit']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"📊 Benchmark results written to {output}")
+
+    failed = [
+        name for name, key in [('reshape', 'equivalent_to_baseline'), ('pipeline_equivalence', 'within_tolerance')]
+        if results.get(name, {}).get(key) is False
+    ]
+    if failed:
+        sys.exit(f"❌ Equivalence checks failed: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
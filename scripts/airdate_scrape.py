@@ -1,10 +1,16 @@
 import pandas as pd
 import datetime as dt
+from functools import partial
+from metadata_cache import FORCE_REFRESH, cached_season_table
+from seasons import DEFAULT_SHOW, get_season
 
-def scrape_airdates(season_num):
-    url = f'https://en.wikipedia.org/wiki/Love_Island_(American_TV_series)_season_{season_num}'
-    tables = pd.read_html(url)
-    episodes = pd.DataFrame(tables[3])
+def scrape_airdates(season_num, show=DEFAULT_SHOW, force_refresh=FORCE_REFRESH):
+    # The table's position differs between season pages, so it comes from the season registry
+    parse = partial(parse_airdates, table_index=get_season(show, season_num)['episode_table'])
+    return cached_season_table(show, season_num, "airdates", parse, force_refresh=force_refresh)
+
+def parse_airdates(tables, table_index=3):
+    episodes = pd.DataFrame(tables[table_index])
 
     # Clean column names
     episodes.columns = episodes.columns.str.strip()
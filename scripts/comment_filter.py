@@ -0,0 +1,205 @@
+import os
+import re
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import pandas as pd
+from run_report import report
+
+# Thresholds can be tuned per run through the environment.
+# Estimated Jaccard similarity above which a comment counts as a repeat of one already seen
+DUPLICATE_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+# Shorter comments ("Yes!!", "So bad") are legitimately repeated by different people, so they are never deduplicated
+MIN_DEDUP_CHARS = int(os.getenv("DEDUP_MIN_CHARS", "40"))
+# Signatures remembered for comparison; the oldest are forgotten first, so memory stays flat on long runs.
+# Each costs 576 bytes (signature 256, band keys 128, sorted band index 192), about 58 MB at the default.
+MAX_SIGNATURES = int(os.getenv("DEDUP_MAX_SIGNATURES", "100000"))
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+# 16 bands of 4 rows: pairs around 0.5 similarity and up become candidates, then the threshold decides
+BANDS = 16
+
+REMOVED_BODIES = {'[deleted]', '[removed]'}
+BOT_AUTHORS = {'AutoModerator'}
+BOT_FOOTER = "i am a bot, and this action was performed automatically"
+URL_PATTERN = re.compile(r'https?://\S+|www\.\S+')
+# Minimum share of distinct words in a long comment; "HUDA HUDA HUDA ..." style spam falls far below it
+MIN_UNIQUE_WORD_RATIO = 0.3
+MIN_WORDS_FOR_RATIO = 20
+
+_rng = np.random.default_rng(20250601)
+# Multiply-shift hash family: h(x) = (a * x + b) mod 2^64, top 32 bits. Fixed seed so signatures are stable across runs.
+HASH_A = _rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+HASH_B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+
+
+def normalize_comment(text):
+    text = URL_PATTERN.sub(' ', text.lower())
+    return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', ' ', text)).strip()
+
+
+# Byte k-grams are packed into one integer each (base 256), so shingling is a strided dot product
+SHINGLE_WEIGHTS = np.uint64(256) ** np.arange(SHINGLE_SIZE, dtype=np.uint64)
+# Signatures are computed for this many comments at a time; bounds the (shingles x NUM_PERM) hash matrix
+SIGNATURE_BATCH = 128
+
+
+def minhash_signatures(texts, k=SHINGLE_SIZE):
+    # (len(texts), NUM_PERM) uint32 MinHash signatures over byte k-gram shingles, vectorized across comments
+    signatures = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+    for start in range(0, len(texts), SIGNATURE_BATCH):
+        encoded = [text.encode("utf-8").ljust(k) for text in texts[start:start + SIGNATURE_BATCH]]
+        lengths = np.array([len(data) for data in encoded])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+
+        # Windows that start inside a comment and end inside the same comment
+        ends = np.cumsum(lengths)
+        window_starts = np.arange(len(data) - k + 1)
+        owner = np.searchsorted(ends, window_starts, side='right')
+        valid = window_starts + k <= ends[owner]
+        shingles = sliding_window_view(data, k)[valid] @ SHINGLE_WEIGHTS
+
+        with np.errstate(over='ignore'):
+            hashed = (shingles[:, None] * HASH_A[None, :] + HASH_B[None, :]) >> np.uint64(32)
+        # Each comment owns a contiguous run of valid windows
+        offsets = np.concatenate([[0], np.cumsum(lengths - k + 1)[:-1]])
+        signatures[start:start + len(encoded)] = np.minimum.reduceat(hashed, offsets, axis=0)
+    return signatures
+
+
+def spam_reason(comment, author=None):
+    # Cheap checks only; returns why a comment should be skipped, or None
+    if not isinstance(comment, str) or comment.strip() in REMOVED_BODIES:
+        return 'removed'
+    if author in BOT_AUTHORS or BOT_FOOTER in comment.lower():
+        return 'bot'
+    if not URL_PATTERN.sub('', comment).strip():
+        return 'link_only'
+    words = comment.lower().split()
+    if len(words) >= MIN_WORDS_FOR_RATIO and len(set(words)) / len(words) < MIN_UNIQUE_WORD_RATIO:
+        return 'repetitive'
+    return None
+
+
+class NearDuplicateFilter:
+    # Streaming MinHash / LSH: every comment is compared only against earlier comments sharing an LSH band,
+    # and at most max_signatures earlier comments are remembered, in a ring buffer (oldest forgotten first).
+    # Everything remembered lives in numpy arrays: signatures, band keys, and per band the keys sorted for
+    # searchsorted, merged after each call. Only the current call's comments sit in a Python dict.
+    def __init__(self, threshold=DUPLICATE_THRESHOLD, min_chars=MIN_DEDUP_CHARS,
+                 max_signatures=MAX_SIGNATURES, bands=BANDS):
+        if NUM_PERM % bands:
+            raise ValueError(f"bands must divide {NUM_PERM}")
+        self.threshold = threshold
+        self.min_chars = min_chars
+        self.max_signatures = max_signatures
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        # Zero-filled, so pages are only committed as the buffer fills
+        self.signatures = np.zeros((max_signatures, NUM_PERM), dtype=np.uint32)
+        self.keys = np.zeros((max_signatures, bands), dtype=np.uint64)
+        self.next_id = 0
+        # (bands, remembered): each band's keys in sorted order, and the ring slot each came from
+        self.sorted_keys = np.zeros((bands, 0), dtype=np.uint64)
+        self.sorted_slots = np.zeros((bands, 0), dtype=np.int32)
+
+    def band_keys(self, signatures):
+        # One integer per (comment, band): the band's rows folded together by a fixed random projection,
+        # salted per band so equal rows in different bands are different keys
+        bands = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        with np.errstate(over='ignore'):
+            return (bands * HASH_A[:self.rows]).sum(axis=2) + HASH_B[:self.bands]
+
+    def remembered_candidates(self, band_keys):
+        # Ring slots sharing at least one band key with each comment, looked up for the whole call at once
+        candidates = [set() for _ in range(len(band_keys))]
+        for band in range(self.bands):
+            keys = self.sorted_keys[band]
+            lo = np.searchsorted(keys, band_keys[:, band], side='left')
+            hi = np.searchsorted(keys, band_keys[:, band], side='right')
+            for i in np.flatnonzero(hi > lo):
+                candidates[i].update(self.sorted_slots[band, lo[i]:hi[i]].tolist())
+        return candidates
+
+    def duplicates(self, comments):
+        # Boolean mask over comments; a repeat of an earlier comment in the same call counts too
+        texts = [normalize_comment(comment) for comment in comments]
+        eligible = [i for i, text in enumerate(texts) if len(text) >= self.min_chars]
+        mask = np.zeros(len(texts), dtype=bool)
+        if not eligible:
+            return mask
+
+        signatures = minhash_signatures([texts[i] for i in eligible])
+        band_keys = self.band_keys(signatures)
+        remembered = self.remembered_candidates(band_keys)
+        # Band key -> positions of this call's comments kept so far
+        buckets = {}
+        kept = []
+        for position, (i, signature, keys) in enumerate(zip(eligible, signatures, band_keys)):
+            keys = keys.tolist()
+            current = {j for key in keys for j in buckets.get(key, ())}
+            earlier = [self.signatures[list(remembered[position])], signatures[list(current)]]
+            # Share of agreeing hash functions estimates the Jaccard similarity of the shingle sets
+            if any(len(sigs) and (sigs == signature).mean(axis=1).max() >= self.threshold for sigs in earlier):
+                mask[i] = True
+                continue
+            kept.append(position)
+            for key in keys:
+                buckets.setdefault(key, []).append(position)
+
+        self.remember(signatures[kept], band_keys[kept])
+        return mask
+
+    def remember(self, signatures, band_keys):
+        # Writes over the oldest slots once the ring is full, then merges the new keys into each band's
+        # sorted index in place of the overwritten ones; no full re-sort
+        signatures, band_keys = signatures[-self.max_signatures:], band_keys[-self.max_signatures:]
+        slots = (self.next_id + np.arange(len(signatures))) % self.max_signatures
+        overwritten = np.zeros(self.max_signatures, dtype=bool)
+        overwritten[slots] = True
+        # Every slot appears once per band, so each band drops the same number of entries
+        keep = ~overwritten[self.sorted_slots]
+        sorted_keys = self.sorted_keys[keep].reshape(self.bands, -1)
+        sorted_slots = self.sorted_slots[keep].reshape(self.bands, -1)
+
+        self.signatures[slots] = signatures
+        self.keys[slots] = band_keys
+        self.next_id += len(signatures)
+
+        order = np.argsort(band_keys, axis=0, kind='stable')
+        merged_keys, merged_slots = [], []
+        for band in range(self.bands):
+            new_keys = band_keys[order[:, band], band]
+            positions = np.searchsorted(sorted_keys[band], new_keys, side='right')
+            merged_keys.append(np.insert(sorted_keys[band], positions, new_keys))
+            merged_slots.append(np.insert(sorted_slots[band], positions, slots[order[:, band]].astype(np.int32)))
+        self.sorted_keys = np.stack(merged_keys)
+        self.sorted_slots = np.stack(merged_slots)
+
+
+class CommentFilter:
+    # Drops spam and near-duplicate comments before they reach spaCy and the model.
+    # One instance per run, so repeats are caught across batches and threads.
+    def __init__(self, **dedup_options):
+        self.dedup = NearDuplicateFilter(**dedup_options)
+
+    def reasons(self, comments):
+        # comments: DataFrame with a comment column (author optional). Returns None for kept rows.
+        authors = comments['author'] if 'author' in comments.columns else pd.Series(None, index=comments.index)
+        reasons = pd.Series(
+            [spam_reason(comment, author) for comment, author in zip(comments['comment'], authors)],
+            index=comments.index,
+            dtype=object
+        )
+        # Only comments that passed the spam checks are remembered for deduplication
+        clean = reasons.isna()
+        duplicate = self.dedup.duplicates(comments.loc[clean, 'comment'].to_list())
+        reasons.iloc[np.flatnonzero(clean.to_numpy())[duplicate]] = 'duplicate'
+        return reasons
+
+    def apply(self, comments):
+        with report.stage('comment_filter'):
+            reasons = self.reasons(comments)
+        for reason, n in reasons.value_counts().items():
+            report.count(f"filtered_{reason}", int(n))
+        return comments[reasons.isna()]
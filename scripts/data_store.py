@@ -0,0 +1,550 @@
+import os
+import json
+import heapq
+import hashlib
+import datetime as dt
+from operator import attrgetter
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+STORE_ROOT = "data/store"
+MANIFEST_NAME = "manifest.json"
+AGGREGATES_NAME = "aggregates.parquet"
+TOP_COMMENTS_NAME = "top_comments.parquet"
+TIMELINE_NAME = "timeline.parquet"
+
+# Comments kept per (show, season, episode, islander) in the top-comment index; the summarizer reads 50
+TOP_N = 50
+# Same cut-off prepare_text_for_summary applies to short comments
+MIN_COMMENT_CHARS = 30
+TOP_COLUMNS = ['show', 'season', 'episode_num', 'islander', 'comment', 'score', 'path']
+AGGREGATE_COLUMNS = [
+    'show', 'season', 'islander', 'episode_num', 'airdate', 'comment_count',
+    'avg_sentiment', 'sentiment_var', 'weighted_sentiment'
+]
+
+# Reaction timeline: per-islander sums and counts in fixed buckets after an episode airs.
+# Sums and counts add up, so new partitions merge into existing buckets without re-reading anything.
+TIMELINE_BUCKET_MINUTES = [15, 60]
+TIMELINE_HORIZON_HOURS = 48
+TIMELINE_KEY = ['show', 'season', 'islander', 'episode_num', 'bucket_minutes', 'bucket']
+TIMELINE_COLUMNS = TIMELINE_KEY + ['comment_count', 'sentiment_sum', 'weighted_sum', 'weight_sum']
+# Parquet metadata key listing the partitions already rolled into a season's timeline
+TIMELINE_PATHS_KEY = b'rolled_up_paths'
+
+# Columns load_store returns by default. The dashboard itself reads snapshots of the per-season
+# derived tables (shared_snapshot.py), never the partitions.
+STORE_COLUMNS = ['islander', 'episode_num', 'airdate', 'sentiment', 'comment', 'score']
+
+# Each partition is a pair of files: a slim mentions table (one row per comment x islander) and a
+# comments table holding every comment's text and metadata once, joined on comment_id.
+# The raw thread files keep their own copy of the text on purpose: they are the crawler's record of what
+# was fetched, hold every comment (not just those naming an islander) and have no stable comment ids,
+# so the store never points into them and the dashboard never has to read them.
+MENTION_COLUMNS = ['comment_id', 'islander', 'sentiment', 'episode_num', 'airdate']
+MENTION_DTYPES = {'islander': 'category', 'sentiment': 'float32', 'episode_num': 'int16'}
+# Mentions are sorted by islander, so small row groups let per-islander reads skip most of a file
+MENTION_ROW_GROUP = 4096
+COMMENT_ROW_GROUP = 16384
+PARQUET_OPTIONS = {'compression': 'zstd', 'compression_level': 9, 'write_statistics': True}
+
+
+def season_dir(show, season):
+    # Aggregates and the top-comment index live here too, so one season's reads never open another's files
+    return f"show={show}/season={season}"
+
+
+def partition_dir(show, season, episode):
+    return f"{season_dir(show, season)}/episode={episode}"
+
+
+def season_partitions(partitions, show=None, season=None):
+    return [
+        p for p in partitions
+        if (show is None or p['show'] == show) and (season is None or p['season'] == season)
+    ]
+
+
+def stored_seasons(root=STORE_ROOT):
+    # (show, season) pairs with at least one partition
+    return sorted({(p['show'], p['season']) for p in read_manifest(root)['partitions']})
+
+
+def file_checksum(paths):
+    # Content hash of a partition's files, so rewriting one with the same row counts still changes the manifest version
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def write_parquet_atomic(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def ensure_comment_ids(df):
+    # Rows fetched before comment ids were stored get a stable synthetic id ("h" + 16 hex digits)
+    # hashed from the fields that identify a comment; hash_pandas_object uses a fixed key
+    if 'comment_id' in df.columns and df['comment_id'].notna().all():
+        return df
+    synthetic = pd.util.hash_pandas_object(
+        df[['episode_post_id', 'author', 'created_utc', 'comment']], index=False
+    ).map(lambda h: f"h{h:016x}")
+    existing = df['comment_id'] if 'comment_id' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    return df.assign(comment_id=existing.fillna(synthetic).astype(str))
+
+
+def write_normalized(wide, mentions_path, comments_path):
+    # Splits scored rows into the partition's mentions and comments files; returns (mentions, comments) counts
+    wide = ensure_comment_ids(wide.drop(columns=['islander_sentiment'], errors='ignore'))
+    mentions = (
+        wide[MENTION_COLUMNS]
+        .astype(MENTION_DTYPES)
+        .sort_values(['islander', 'comment_id'], kind='stable')
+    )
+    comments = (
+        wide.drop(columns=[c for c in MENTION_COLUMNS if c != 'comment_id'])
+        .drop_duplicates('comment_id')
+        .sort_values('comment_id', kind='stable')
+    )
+    pq.write_table(pa.Table.from_pandas(mentions, preserve_index=False), mentions_path,
+                   row_group_size=MENTION_ROW_GROUP, **PARQUET_OPTIONS)
+    pq.write_table(pa.Table.from_pandas(comments, preserve_index=False), comments_path,
+                   row_group_size=COMMENT_ROW_GROUP, **PARQUET_OPTIONS)
+    return len(mentions), len(comments)
+
+
+def read_partition(entry, columns, root=STORE_ROOT):
+    # Reads only the requested columns, joining in the comments file only when a comment column is asked for
+    mention_columns = [c for c in columns if c in MENTION_COLUMNS]
+    comment_columns = [c for c in columns if c not in MENTION_COLUMNS]
+
+    mentions = pq.read_table(
+        os.path.join(root, entry['path']),
+        columns=list(dict.fromkeys(mention_columns + (['comment_id'] if comment_columns else [])))
+    ).to_pandas()
+    if comment_columns:
+        comments = pq.read_table(
+            os.path.join(root, entry['comments_path']),
+            columns=['comment_id'] + comment_columns
+        ).to_pandas()
+        mentions = mentions.merge(comments, on='comment_id', how='left')
+    return mentions[columns]
+
+
+def read_manifest(root=STORE_ROOT):
+    path = os.path.join(root, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'version': None, 'updated_at': None, 'partitions': []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def manifest_version(root=STORE_ROOT):
+    # Cheap enough to call on every Streamlit rerun; only changes when partitions are written
+    return read_manifest(root)['version']
+
+
+def write_manifest(manifest, root=STORE_ROOT):
+    partitions = sorted(manifest['partitions'], key=lambda p: (p['show'], p['season'], p['episode'], p['path']))
+    manifest = {
+        # Content-addressed version: same partitions, same version, so caches only drop on real changes
+        'version': hashlib.sha1(json.dumps(partitions, sort_keys=True).encode("utf-8")).hexdigest()[:16],
+        'updated_at': dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds'),
+        'partitions': partitions
+    }
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    # Readers see either the old manifest or the new one, never a half-written file
+    os.replace(tmp_path, path)
+    return manifest
+
+
+class PartitionWriter:
+    # Appends scored rows to a staging file per episode partition as batches arrive. close() splits each
+    # staging file into its mentions / comments pair, and nothing is visible to readers until the
+    # manifest registers them.
+    def __init__(self, show, season, source, root=STORE_ROOT, airing=None):
+        self.show = show
+        self.season = season
+        self.source = source
+        self.root = root
+        # {'air_time', 'timezone'} of the season (seasons.airing); partitions without it stay out of the timeline
+        self.airing = airing or {}
+        self.writers = {}
+        self.rows = {}
+        self.comments = {}
+        self.total_rows = 0
+        self.discard = {}
+
+    def path_for(self, episode):
+        return f"{partition_dir(self.show, self.season, episode)}/{self.source}.mentions.parquet"
+
+    def comments_path_for(self, episode):
+        return f"{partition_dir(self.show, self.season, episode)}/{self.source}.comments.parquet"
+
+    def staging_path(self, episode):
+        return os.path.join(self.root, partition_dir(self.show, self.season, episode), f".{self.source}.staging.parquet")
+
+    def write(self, df):
+        # Per-comment dicts of every islander's score are not needed downstream
+        df = df.drop(columns=['islander_sentiment'], errors='ignore')
+        for episode, part in df.groupby('episode_num'):
+            episode = int(episode)
+            table = pa.Table.from_pandas(part, preserve_index=False)
+            if episode not in self.writers:
+                os.makedirs(os.path.join(self.root, partition_dir(self.show, self.season, episode)), exist_ok=True)
+                self.writers[episode] = pq.ParquetWriter(self.staging_path(episode), table.schema)
+                self.rows[episode] = 0
+            else:
+                table = table.cast(self.writers[episode].schema)
+            self.writers[episode].write_table(table)
+            self.rows[episode] += len(part)
+            self.total_rows += len(part)
+
+    def discard_rows(self, column, values):
+        # Rows to drop before the partitions are published (e.g. threads that failed mid-download)
+        self.discard.setdefault(column, set()).update(values)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+        for episode in self.writers:
+            staged = pd.read_parquet(self.staging_path(episode))
+            for column, values in self.discard.items():
+                if values:
+                    staged = staged[~staged[column].isin(values)]
+            self.rows[episode], self.comments[episode] = write_normalized(
+                staged,
+                os.path.join(self.root, self.path_for(episode)),
+                os.path.join(self.root, self.comments_path_for(episode))
+            )
+            os.remove(self.staging_path(episode))
+
+        manifest = read_manifest(self.root)
+        entries = {p['path']: p for p in manifest['partitions']}
+        written = []
+        for episode in sorted(self.writers):
+            rel_path = self.path_for(episode)
+            entries[rel_path] = {
+                'show': self.show,
+                'season': self.season,
+                'episode': episode,
+                'path': rel_path,
+                'comments_path': self.comments_path_for(episode),
+                'source': self.source,
+                'rows': self.rows[episode],
+                'comments': self.comments[episode],
+                'checksum': file_checksum([
+                    os.path.join(self.root, self.path_for(episode)),
+                    os.path.join(self.root, self.comments_path_for(episode))
+                ]),
+                **self.airing
+            }
+            written.append(entries[rel_path])
+
+        manifest['partitions'] = list(entries.values())
+        update_aggregates(written, manifest['partitions'], self.root)
+        update_top_comments(written, manifest['partitions'], self.root)
+        update_timeline(written, manifest['partitions'], self.root)
+        # Manifest goes last so readers never see a version whose aggregates are not written yet
+        write_manifest(manifest, self.root)
+        print(f"🗂️ Wrote {len(written)} partitions ({sum(self.rows.values())} rows) from {self.show} season {self.season} {self.source}")
+        return written
+
+
+def write_partitions(df, show, season, source, root=STORE_ROOT, airing=None):
+    # Splits a scored frame by episode and writes one file per episode partition
+    writer = PartitionWriter(show, season, source, root, airing)
+    writer.write(df)
+    return writer.close()
+
+
+def load_store(root=STORE_ROOT, columns=STORE_COLUMNS, show=None, season=None, episodes=None):
+    # Every scored row of a season, for benchmarks and ad-hoc analysis; the pipeline and dashboard never load it.
+    # Partitions are pruned from the manifest by show, season and (inclusive) episode range before any file is opened
+    entries = [
+        p for p in season_partitions(read_manifest(root)['partitions'], show, season)
+        if episodes is None or episodes[0] <= p['episode'] <= episodes[1]
+    ]
+    if not entries:
+        return pd.DataFrame(columns=columns)
+
+    df = pd.concat([read_partition(p, columns, root) for p in entries], ignore_index=True)
+    if 'islander' in df.columns:
+        df['islander'] = df['islander'].astype('category')
+    if 'airdate' in df.columns:
+        df['airdate'] = pd.to_datetime(df['airdate'])
+    return df
+
+
+def read_season_table(name, columns, root=STORE_ROOT, show=None, season=None):
+    # With show and season given this opens exactly one file, however many seasons the store holds
+    if show is not None and season is not None:
+        pairs = [(show, season)]
+    else:
+        pairs = [
+            (s, n) for s, n in stored_seasons(root)
+            if (show is None or s == show) and (season is None or n == season)
+        ]
+    paths = [os.path.join(root, season_dir(s, n), name) for s, n in pairs]
+    frames = [pd.read_parquet(path) for path in paths if os.path.exists(path)]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def group_touched(written):
+    # {(show, season): {episodes}} for the partitions just written
+    touched = {}
+    for p in written:
+        touched.setdefault((p['show'], p['season']), set()).add(p['episode'])
+    return touched
+
+
+def compute_aggregates(df, show, season):
+    return (
+        df
+        # Upvotes as weights; zero or negative scores still count once
+        .assign(
+            # Stored as float32; aggregate in float64
+            sentiment=lambda x: x.sentiment.astype('float64'),
+            weight=lambda x: x.score.clip(lower=1),
+            weighted=lambda x: x.sentiment * x.weight
+        )
+        .groupby(['islander', 'episode_num', 'airdate'], observed=True)
+        .agg(
+            comment_count=('sentiment', 'size'),
+            avg_sentiment=('sentiment', 'mean'),
+            sentiment_var=('sentiment', 'var'),
+            weighted_sum=('weighted', 'sum'),
+            weight_sum=('weight', 'sum')
+        )
+        .reset_index()
+        .assign(
+            show=show,
+            season=season,
+            weighted_sentiment=lambda x: x.weighted_sum / x.weight_sum,
+            islander=lambda x: x.islander.astype(str),
+            episode_num=lambda x: x.episode_num.astype('int64')
+        )
+        [AGGREGATE_COLUMNS]
+    )
+
+
+def read_aggregates(root=STORE_ROOT, show=None, season=None):
+    return read_season_table(AGGREGATES_NAME, AGGREGATE_COLUMNS, root, show, season)
+
+
+def update_aggregates(written, partitions, root=STORE_ROOT):
+    # Only the episodes that just received rows are recomputed, from their own partitions
+    for (show, season), episodes in group_touched(written).items():
+        fresh = []
+        for episode in episodes:
+            episode_rows = pd.concat(
+                [
+                    read_partition(p, ['islander', 'episode_num', 'airdate', 'sentiment', 'score'], root)
+                    for p in season_partitions(partitions, show, season)
+                    if p['episode'] == episode
+                ],
+                ignore_index=True
+            )
+            fresh.append(compute_aggregates(episode_rows, show, season))
+
+        existing = read_aggregates(root, show, season)
+        kept = existing[~existing['episode_num'].isin(episodes)]
+        aggregates = (
+            pd.concat([frame for frame in [kept] + fresh if len(frame)], ignore_index=True)
+            .sort_values(['islander', 'airdate'])
+            .reset_index(drop=True)
+        )
+        write_parquet_atomic(aggregates, os.path.join(root, season_dir(show, season), AGGREGATES_NAME))
+
+
+def compute_top_comments(df, show, season, path, n=TOP_N):
+    # Highest-scored comments per (episode, islander) from one partition
+    return (
+        df[df['comment'].str.len() > MIN_COMMENT_CHARS]
+        .sort_values('score', ascending=False, kind='stable')
+        .groupby(['episode_num', 'islander'], observed=True, sort=False)
+        .head(n)
+        .assign(
+            show=show,
+            season=season,
+            path=path,
+            islander=lambda x: x.islander.astype(str),
+            episode_num=lambda x: x.episode_num.astype('int64')
+        )
+        [TOP_COLUMNS]
+    )
+
+
+def merge_top_comments(frames, n=TOP_N):
+    # Top-n of a union is the top-n of the per-part top-n lists, so each key only merges small candidate lists
+    candidates = pd.concat(frames, ignore_index=True)
+    merged = []
+    for _, group in candidates.groupby(['episode_num', 'islander'], sort=False):
+        merged.extend(heapq.nlargest(n, group.itertuples(index=False), key=attrgetter('score')))
+    return pd.DataFrame(merged, columns=TOP_COLUMNS)
+
+
+def read_top_comments(root=STORE_ROOT, show=None, season=None):
+    return read_season_table(TOP_COMMENTS_NAME, TOP_COLUMNS, root, show, season)
+
+
+def top_comments(index, islander, episodes=None, n=TOP_N):
+    # index: one season's top-comment index. episodes: optional inclusive (first, last) range
+    rows = index[index['islander'] == islander]
+    if episodes is not None:
+        rows = rows[rows['episode_num'].between(*episodes)]
+    return pd.DataFrame(
+        heapq.nlargest(n, rows.itertuples(index=False), key=attrgetter('score')),
+        columns=TOP_COLUMNS
+    )
+
+
+def update_top_comments(written, partitions, root=STORE_ROOT, n=TOP_N):
+    # New partitions are merged into the season's index without re-reading the rest of the store
+    for (show, season), episodes in group_touched(written).items():
+        existing = read_top_comments(root, show, season)
+        season_written = season_partitions(written, show, season)
+
+        # A partition written again may still have its old rows in the index; those episodes are rebuilt in full
+        indexed_paths = set(existing['path'])
+        rebuild = {p['episode'] for p in season_written if p['path'] in indexed_paths}
+        sources = [p for p in season_partitions(partitions, show, season) if p['episode'] in rebuild]
+        sources += [p for p in season_written if p['episode'] not in rebuild]
+
+        fresh = [
+            compute_top_comments(
+                read_partition(p, ['islander', 'episode_num', 'comment', 'score'], root),
+                show,
+                season,
+                p['path'],
+                n
+            )
+            for p in sources
+        ]
+        index = (
+            merge_top_comments([existing[~existing['episode_num'].isin(rebuild)]] + fresh, n)
+            # Stable, so every (islander, episode) block stays in descending score order
+            .sort_values(['islander', 'episode_num'], kind='stable')
+            .reset_index(drop=True)
+        )
+        write_parquet_atomic(index, os.path.join(root, season_dir(show, season), TOP_COMMENTS_NAME))
+
+
+def aired_at(airdates, entry):
+    # Seconds since the epoch at which each airdate's episode started, in the season's local time zone
+    unique = pd.Series(pd.to_datetime(airdates).unique())
+    local = (unique + pd.Timedelta(f"{entry['air_time']}:00")).dt.tz_localize(entry['timezone'])
+    starts = (local - pd.Timestamp(0, tz='UTC')).dt.total_seconds()
+    return pd.to_datetime(airdates).map(dict(zip(unique, starts))).astype('float64')
+
+
+def compute_timeline(df, show, season, entry):
+    # One partition's rows rolled up into every bucket size; entry supplies the airing time
+    minutes = (df['created_utc'] - aired_at(df['airdate'], entry)) / 60
+    in_window = (minutes >= 0) & (minutes < TIMELINE_HORIZON_HOURS * 60)
+    rows = df[in_window].assign(
+        sentiment=lambda x: x.sentiment.astype('float64'),
+        weight=lambda x: x.score.clip(lower=1),
+        weighted=lambda x: x.sentiment * x.weight,
+        islander=lambda x: x.islander.astype(str),
+        episode_num=lambda x: x.episode_num.astype('int64')
+    )
+    frames = [
+        rows.assign(bucket_minutes=size, bucket=(minutes[in_window] // size).astype('int64'))
+        .groupby(['islander', 'episode_num', 'bucket_minutes', 'bucket'])
+        .agg(
+            comment_count=('sentiment', 'size'),
+            sentiment_sum=('sentiment', 'sum'),
+            weighted_sum=('weighted', 'sum'),
+            weight_sum=('weight', 'sum')
+        )
+        .reset_index()
+        .assign(show=show, season=season)
+        [TIMELINE_COLUMNS]
+        for size in TIMELINE_BUCKET_MINUTES
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def merge_timeline(frames):
+    # Buckets are sums and counts, so merging is adding up matching keys
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return pd.DataFrame(columns=TIMELINE_COLUMNS)
+    return (
+        pd.concat(frames, ignore_index=True)
+        .groupby(TIMELINE_KEY, sort=True)
+        [['comment_count', 'sentiment_sum', 'weighted_sum', 'weight_sum']]
+        .sum()
+        .reset_index()
+    )
+
+
+def read_timeline(root=STORE_ROOT, show=None, season=None):
+    return read_season_table(TIMELINE_NAME, TIMELINE_COLUMNS, root, show, season)
+
+
+def timeline_paths(path):
+    if not os.path.exists(path):
+        return set()
+    metadata = pq.read_schema(path).metadata or {}
+    return set(json.loads(metadata.get(TIMELINE_PATHS_KEY, b'[]')))
+
+
+def update_timeline(written, partitions, root=STORE_ROOT):
+    for (show, season), episodes in group_touched(written).items():
+        timeline_path = os.path.join(root, season_dir(show, season), TIMELINE_NAME)
+        rolled_up = timeline_paths(timeline_path)
+        season_written = [p for p in season_partitions(written, show, season) if 'air_time' in p]
+
+        # Adding a partition twice would double its counts, so episodes with a re-written partition are rebuilt
+        rebuild = {p['episode'] for p in season_written if p['path'] in rolled_up}
+        sources = [
+            p for p in season_partitions(partitions, show, season)
+            if p['episode'] in rebuild and 'air_time' in p
+        ]
+        sources += [p for p in season_written if p['episode'] not in rebuild]
+        if not sources:
+            continue
+
+        existing = read_timeline(root, show, season)
+        fresh = [
+            compute_timeline(
+                read_partition(p, ['islander', 'episode_num', 'airdate', 'created_utc', 'sentiment', 'score'], root),
+                show,
+                season,
+                p
+            )
+            for p in sources
+        ]
+        timeline = merge_timeline([existing[~existing['episode_num'].isin(rebuild)]] + fresh)
+
+        table = pa.Table.from_pandas(timeline, preserve_index=False)
+        paths = sorted(rolled_up | {p['path'] for p in sources})
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), TIMELINE_PATHS_KEY: json.dumps(paths)})
+        os.makedirs(os.path.dirname(timeline_path), exist_ok=True)
+        pq.write_table(table, f"{timeline_path}.tmp")
+        os.replace(f"{timeline_path}.tmp", timeline_path)
+
+
+def timeline_series(buckets):
+    # Chart-ready view of timeline rows: bucket start in hours after airing and mean sentiment per bucket
+    return buckets.assign(
+        hours_after_air=lambda x: x.bucket * x.bucket_minutes / 60,
+        avg_sentiment=lambda x: x.sentiment_sum / x.comment_count,
+        weighted_sentiment=lambda x: x.weighted_sum / x.weight_sum
+    )[['hours_after_air', 'comment_count', 'avg_sentiment', 'weighted_sentiment']]
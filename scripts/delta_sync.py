@@ -0,0 +1,204 @@
+import os
+import re
+import json
+import glob
+import time
+import asyncio
+import datetime as dt
+import pandas as pd
+import pyarrow.parquet as pq
+from reddit_async import AsyncRedditFetcher, HttpxTransport
+from initial_sentiment import batch_targeted_mentions, reshape_mentions
+from data_store import write_partitions
+from comment_filter import CommentFilter
+from run_report import report
+from seasons import airing, get_season, season_key
+
+# One state file per season, so two active seasons never share a high-water mark
+SYNC_STATE_DIR = "data/sync_state"
+
+# Comments this close to the high-water mark are re-checked against known ids, in case
+# Reddit surfaced them in the listing a little after they were created
+OVERLAP_SECONDS = 300
+
+
+def sync_state_path(show, season):
+    return os.path.join(SYNC_STATE_DIR, f"{season_key(show, season)}.json")
+
+
+def load_sync_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_sync_state(state, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def record_comments(entry, comments):
+    # comments: DataFrame with created_utc and (for anything fetched since async downloads) comment_id
+    if comments.empty:
+        return entry
+    previous = entry.get('high_water_utc') or 0
+    high_water = max(previous, float(comments['created_utc'].max()))
+    entry['high_water_utc'] = high_water
+    if 'comment_id' in comments.columns:
+        # Only ids inside the overlap window are ever checked again (is_new_comment), so older ones are
+        # dropped and the state stays a few ids per thread however long the thread runs
+        recent = comments['created_utc'] > high_water - OVERLAP_SECONDS
+        known = set(comments.loc[recent, 'comment_id'].dropna())
+        if previous > high_water - OVERLAP_SECONDS:
+            known.update(entry.get('comment_ids', []))
+        entry['comment_ids'] = sorted(known)
+    return entry
+
+
+def bootstrap_sync_state(state, output_folder="data/season7_comments"):
+    # Any full thread download without a sync entry yet gets one from its raw file
+    for path in glob.glob(f"{output_folder}/*_comments.parquet"):
+        match = re.search(r'_(\w+)_comments\.parquet$', path)
+        if not match or match.group(1) in state:
+            continue
+        comments = pd.read_parquet(path)
+        if len(comments):
+            title = comments['episode_title'].iloc[0]
+        else:
+            # Threads that were empty when downloaded keep their title in the file metadata
+            title = (pq.read_schema(path).metadata or {}).get(b'episode_title', b'').decode() or None
+        entry = {
+            'episode_title': title,
+            # The first comment lands within seconds of the post; close enough for an age cut-off
+            'thread_created_utc': float(comments['created_utc'].min()) if len(comments) else time.time(),
+            'high_water_utc': None,
+            'comment_ids': []
+        }
+        state[match.group(1)] = record_comments(entry, comments)
+    return state
+
+
+def is_new_comment(entry, comment, known):
+    high_water = entry.get('high_water_utc') or 0
+    if known:
+        return comment['comment_id'] not in known and comment['created_utc'] > high_water - OVERLAP_SECONDS
+    # Threads downloaded before comment ids were stored only have the timestamp to go on
+    return comment['created_utc'] > high_water
+
+
+async def collect_new_comments(fetcher, subreddit, state, active, max_pages=10):
+    wanted = {f"t3_{post_id}": post_id for post_id in active}
+    found = {post_id: {} for post_id in active}
+    floor = min((state[post_id].get('high_water_utc') or 0) for post_id in active)
+    oldest_seen = None
+
+    # Cheap path: page back through the subreddit-wide comment listing until every active
+    # thread's high-water mark is covered. Reddit serves only about the newest 1000 comments there,
+    # so on a busy subreddit a daily run usually falls back to full thread walks; the run report
+    # counts how often (full_thread_walks / synced_threads).
+    async for page in fetcher.iter_subreddit_comments(subreddit, max_pages=max_pages):
+        for comment in page:
+            post_id = wanted.get(comment['link_id'])
+            if post_id is not None:
+                found[post_id][comment['comment_id']] = comment
+        if page:
+            page_oldest = min(c['created_utc'] for c in page)
+            oldest_seen = page_oldest if oldest_seen is None else min(oldest_seen, page_oldest)
+        if oldest_seen is not None and oldest_seen <= floor:
+            break
+
+    # Threads whose gap the listing could not reach fall back to a full walk of the thread
+    for post_id in active:
+        high_water = state[post_id].get('high_water_utc') or 0
+        if oldest_seen is None or oldest_seen > high_water:
+            print(f"🔁 Listing did not reach {post_id}'s high-water mark; walking the full thread")
+            report.count('full_thread_walks')
+            async for page in fetcher.iter_submission_comments(post_id):
+                for comment in page:
+                    found[post_id][comment['comment_id']] = comment
+
+    new_comments = {}
+    for post_id, comments in found.items():
+        known = set(state[post_id].get('comment_ids', []))
+        new_comments[post_id] = [c for c in comments.values() if is_new_comment(state[post_id], c, known)]
+    return new_comments
+
+
+def sync_active_threads(islanders, episode_airdates, show, season, subreddit=None, output_folder=None,
+                        max_age_days=7, max_pages=10, state_path=None, transport=None):
+    # Subreddit, raw folder and sync state default to the season's registry entry
+    entry = get_season(show, season)
+    subreddit = subreddit or entry['subreddit']
+    output_folder = output_folder or entry['raw_folder']
+    state_path = state_path or sync_state_path(show, season)
+    report.reset()
+    state = bootstrap_sync_state(load_sync_state(state_path), output_folder)
+    cutoff = time.time() - max_age_days * 86400
+    active = [post_id for post_id, entry in state.items() if entry['thread_created_utc'] >= cutoff]
+    for post_id, thread_state in state.items():
+        # Threads past the re-sync window are never fetched again; their entry only marks them as known
+        if thread_state['thread_created_utc'] < cutoff:
+            thread_state['comment_ids'] = []
+
+    if not active:
+        print(f"✅ No threads younger than {max_age_days} days to re-sync.")
+        save_sync_state(state, state_path)
+        return []
+
+    async def run():
+        active_transport = transport or HttpxTransport.from_env()
+        try:
+            return await collect_new_comments(AsyncRedditFetcher(active_transport), subreddit, state, active, max_pages)
+        finally:
+            if transport is None:
+                await active_transport.aclose()
+
+    report.count('synced_threads', len(active))
+    with report.stage('fetch'):
+        new_comments = asyncio.run(run())
+    stamp = dt.datetime.now(dt.timezone.utc).strftime('%Y%m%d%H%M')
+    delta_folder = f"{output_folder}/deltas"
+
+    deltas = {}
+    for post_id, comments in new_comments.items():
+        if not comments:
+            continue
+        delta = (
+            pd.DataFrame(comments)
+            .drop(columns=['link_id'], errors='ignore')
+            .assign(episode_post_id=post_id, episode_title=state[post_id]['episode_title'])
+        )
+        os.makedirs(delta_folder, exist_ok=True)
+        delta.to_parquet(f"{delta_folder}/{post_id}_{stamp}_delta.parquet", index=False)
+        deltas[post_id] = delta
+        print(f"➕ {len(delta)} new comments for: {state[post_id]['episode_title']}")
+
+    written = []
+    if deltas:
+        delta_comments = pd.concat(deltas.values(), ignore_index=True)
+        report.count('fetched_comments', len(delta_comments))
+        delta_comments = CommentFilter().apply(delta_comments).reset_index(drop=True)
+        mentions = batch_targeted_mentions(delta_comments.comment, islanders)
+        with report.stage('reshape'):
+            scored = reshape_mentions(delta_comments, mentions, episode_airdates)
+        with report.stage('parquet_write'):
+            written = write_partitions(scored, show, season, source=f"delta_{stamp}", airing=airing(show, season))
+        report.count('mention_rows', len(scored))
+
+        # State only moves forward once the delta partitions are safely written
+        for post_id, delta in deltas.items():
+            record_comments(state[post_id], delta)
+    else:
+        print("📭 Active threads have no new comments.")
+
+    walks = report.counters.get('full_thread_walks', 0)
+    print(f"🔁 Full thread walks: {walks}/{len(active)} active threads")
+    report.write(f"{season_key(show, season)}_delta_{stamp}", show=show, season=season, source=f"delta_{stamp}",
+                 partitions=[p['path'] for p in written])
+
+    save_sync_state(state, state_path)
+    return written
@@ -0,0 +1,153 @@
+import os
+import copy
+import fcntl
+from contextlib import contextmanager
+import numpy as np
+import torch
+
+BACKEND_NAMES = ['torch', 'torch-int8', 'onnx', 'onnx-int8']
+ONNX_DIR = "data/cache/onnx"
+
+
+def softmax(logits):
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class TorchBackend:
+    name = 'torch'
+
+    def __init__(self, model):
+        self.model = model.eval()
+
+    def predict(self, input_ids, attention_mask):
+        with torch.inference_mode():
+            output = self.model(
+                input_ids=torch.as_tensor(input_ids),
+                attention_mask=torch.as_tensor(attention_mask)
+            )
+        return torch.nn.functional.softmax(output.logits, dim=1).numpy()
+
+
+class QuantizedTorchBackend(TorchBackend):
+    name = 'torch-int8'
+
+    def __init__(self, model):
+        # Dynamic int8: Linear weights are quantized once, activations per batch. No calibration data needed.
+        quantized = torch.quantization.quantize_dynamic(copy.deepcopy(model).eval(), {torch.nn.Linear}, dtype=torch.qint8)
+        super().__init__(quantized)
+
+
+@contextmanager
+def export_lock(model_dir):
+    # One exporter at a time across processes; the others wait, then find the finished file
+    with open(os.path.join(model_dir, ".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def export_onnx(model, model_id, export_dir=ONNX_DIR, quantize=False):
+    model_dir = os.path.join(export_dir, model_id.replace('/', '__'))
+    fp32_path = os.path.join(model_dir, "model.onnx")
+    int8_path = os.path.join(model_dir, "model.int8.onnx")
+    os.makedirs(model_dir, exist_ok=True)
+
+    # Exports are cached next to the chunk cache, so only the first run pays for them. Each file is
+    # written under a temporary name and renamed into place, so a model file is never seen half-written.
+    with export_lock(model_dir):
+        if not os.path.exists(fp32_path):
+            export_fp32(model, model_id, fp32_path)
+        if quantize and not os.path.exists(int8_path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            print("📦 Quantizing ONNX model to int8...")
+            tmp_path = os.path.join(model_dir, f"model.int8.tmp-{os.getpid()}.onnx")
+            quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, int8_path)
+    return int8_path if quantize else fp32_path
+
+
+def export_fp32(model, model_id, fp32_path):
+    print(f"📦 Exporting {model_id} to ONNX...")
+    tmp_path = f"{fp32_path[:-len('.onnx')]}.tmp-{os.getpid()}.onnx"
+    dummy = torch.ones((1, 8), dtype=torch.long)
+    torch.onnx.export(
+        model.eval(),
+        (dummy, dummy),
+        tmp_path,
+        input_names=['input_ids', 'attention_mask'],
+        output_names=['logits'],
+        dynamic_axes={
+            'input_ids': {0: 'batch', 1: 'sequence'},
+            'attention_mask': {0: 'batch', 1: 'sequence'},
+            'logits': {0: 'batch'}
+        },
+        opset_version=14
+    )
+    os.replace(tmp_path, fp32_path)
+
+
+class OnnxBackend:
+    def __init__(self, model, model_id, quantize=False, export_dir=ONNX_DIR):
+        import onnxruntime as ort
+        self.name = 'onnx-int8' if quantize else 'onnx'
+        options = ort.SessionOptions()
+        # Respect the per-worker thread budget set for torch
+        options.intra_op_num_threads = torch.get_num_threads()
+        self.session = ort.InferenceSession(
+            export_onnx(model, model_id, export_dir, quantize),
+            options,
+            providers=['CPUExecutionProvider']
+        )
+
+    def predict(self, input_ids, attention_mask):
+        logits = self.session.run(['logits'], {
+            'input_ids': np.asarray(input_ids, dtype=np.int64),
+            'attention_mask': np.asarray(attention_mask, dtype=np.int64)
+        })[0]
+        return softmax(logits)
+
+
+def load_backend(name, model, model_id):
+    if name not in BACKEND_NAMES:
+        raise ValueError(f"Unknown sentiment backend '{name}'. Choose one of {BACKEND_NAMES}")
+    if name == 'torch':
+        return TorchBackend(model)
+    if name == 'torch-int8':
+        return QuantizedTorchBackend(model)
+    try:
+        return OnnxBackend(model, model_id, quantize=(name == 'onnx-int8'))
+    except Exception as e:
+        # Scores are cached per backend, so silently scoring with another one would mislabel the cache
+        print(f"❌ Could not load the {name} backend ({e}). Install onnxruntime or set SENTIMENT_BACKEND=torch.")
+        raise
+
+
+def sentiment_labels(compound):
+    # Same +/-0.05 neutral band as the dashboard's classify_sentiment
+    return np.where(compound >= 0.05, 1, np.where(compound <= -0.05, -1, 0))
+
+
+def compare_backends(reference, candidate, tokenizer, texts, batch_size=64):
+    # Compound score (positive - negative) agreement between two backends on the same chunks
+    ref_compound, cand_compound = [], []
+    for start in range(0, len(texts), batch_size):
+        encoded = tokenizer(texts[start:start + batch_size], truncation=True, padding=True, return_tensors='np')
+        ref = reference.predict(encoded['input_ids'], encoded['attention_mask'])
+        cand = candidate.predict(encoded['input_ids'], encoded['attention_mask'])
+        ref_compound.append(ref[:, 2] - ref[:, 0])
+        cand_compound.append(cand[:, 2] - cand[:, 0])
+
+    ref_compound = np.concatenate(ref_compound)
+    cand_compound = np.concatenate(cand_compound)
+    diff = np.abs(ref_compound - cand_compound)
+    return {
+        'backend': candidate.name,
+        'chunks': len(texts),
+        'mean_abs_diff': float(diff.mean()),
+        'p99_abs_diff': float(np.quantile(diff, 0.99)),
+        'max_abs_diff': float(diff.max()),
+        'label_agreement': float(np.mean(sentiment_labels(ref_compound) == sentiment_labels(cand_compound)))
+    }
@@ -1,77 +1,196 @@
 import pandas as pd
 import re
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
 import numpy as np
-import nltk
-from nltk.tokenize import sent_tokenize
-nltk.download('punkt')
 import ast
-import datetime as dt
-from airdate_scrape import scrape_airdates
-from islander_scrape import scrape_islanders
-import spacy
-
-# Load Model
-tokenizer = AutoTokenizer.from_pretrained("cardiffnlp/twitter-roberta-base-sentiment")
-model = AutoModelForSequenceClassification.from_pretrained("cardiffnlp/twitter-roberta-base-sentiment")
-
-# Sentiment Function
-def get_sentiment_score(text):
-    tokens = tokenizer(text, return_tensors='pt', truncation=True)
-    with torch.no_grad():
-        output = model(**tokens)
-    scores = torch.nn.functional.softmax(output.logits, dim=1)
+import time
+from name_matcher import build_name_index
+from model_registry import get_tokenizer, get_backend, get_sentiment_cache, get_nlp
+from run_report import report
+
+def probs_to_scores(probs):
     return {
-        'negative': scores[0][0].item(),
-        'neutral': scores[0][1].item(),
-        'positive': scores[0][2].item(),
-        'compound': scores[0][2].item() - scores[0][0].item()
+        'negative': float(probs[0]),
+        'neutral': float(probs[1]),
+        'positive': float(probs[2]),
+        'compound': float(probs[2] - probs[0])
     }
 
+def score_batches(texts, batch_size=64, max_batch_tokens=8192, backend=None):
+    probs = np.zeros((len(texts), 3))
+    if not texts:
+        return probs
+
+    tokenizer = get_tokenizer()
+    # An explicit backend lets benchmarks compare backends without touching the process-wide one
+    backend = backend or get_backend()
+
+    # Tokenize once without padding, then group similar lengths so batches carry little padding
+    with report.stage('tokenize'):
+        input_ids = tokenizer(texts, truncation=True)['input_ids']
+    order = sorted(range(len(texts)), key=lambda i: len(input_ids[i]))
+
+    def run_batch(batch):
+        with report.stage('tokenize'):
+            padded = tokenizer.pad({'input_ids': [input_ids[i] for i in batch]}, return_tensors='np')
+        with report.stage('inference'):
+            probs[batch] = backend.predict(padded['input_ids'], padded['attention_mask'])
+        report.count('model_batches')
+        report.observe('model_batch_size', len(batch))
+        report.observe('model_batch_tokens', int(padded['input_ids'].size))
+
+    batch = []
+    for i in order:
+        # Lengths are ascending, so the current chunk sets the padded width of the batch
+        if batch and (len(batch) == batch_size or (len(batch) + 1) * len(input_ids[i]) > max_batch_tokens):
+            run_batch(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        run_batch(batch)
+
+    return probs
+
+# Batched Sentiment Function
+def get_sentiment_scores(texts, batch_size=64, max_batch_tokens=8192, use_cache=True):
+    # Repeated chunks (quotes, copypasta) are scored once per run, and cached chunks not at all
+    unique_texts = list(dict.fromkeys(texts))
+    sentiment_cache = get_sentiment_cache() if use_cache else None
+    with report.stage('cache_lookup'):
+        scored = sentiment_cache.get_many(unique_texts) if use_cache else {}
+    missing = [text for text in unique_texts if text not in scored]
+    report.count('unique_chunks', len(unique_texts))
+    report.count('cache_hits', len(scored))
+    report.count('cache_misses', len(missing))
+
+    new_scores = {
+        text: probs_to_scores(probs)
+        for text, probs in zip(missing, score_batches(missing, batch_size, max_batch_tokens))
+    }
+    if use_cache:
+        with report.stage('cache_write'):
+            sentiment_cache.put_many(new_scores)
+    scored.update(new_scores)
 
+    return np.array([scored[text]['compound'] for text in texts])
 
 
-nlp = spacy.load("en_core_web_sm")
-
-def targeted_sentiment(comment, islanders):
-    islander_sentiment = {}
-    doc = nlp(comment)
+def as_name_index(islanders):
+    # Accept a prebuilt index (from either import path) or a plain list of names
+    return islanders if hasattr(islanders, 'find') else build_name_index(islanders)
 
+def split_into_chunks(doc):
+    chunks = []
     for sent in doc.sents:
-        sentence_text = sent.text
         # Split each sentence into smaller chunks by contrastive conjunctions and commas
-        raw_chunks = re.split(r'\bbut\b|\band\b|,', sentence_text, flags=re.IGNORECASE)
-
-        for chunk in raw_chunks:
-            if len(chunk.strip()) == 0:
-                continue
-            chunk_doc = nlp(chunk)
-            result = get_sentiment_score(chunk)
-            chunk_lower = chunk.lower()
-
-            for name in islanders:
-                if name.lower() in chunk_lower:
-                    if name not in islander_sentiment:
-                        islander_sentiment[name] = []
-                    islander_sentiment[name].append(result["compound"])
-
-    return {name: np.mean(scores) for name, scores in islander_sentiment.items()}
+        raw_chunks = re.split(r'\bbut\b|\band\b|,', sent.text, flags=re.IGNORECASE)
+        chunks.extend(chunk for chunk in raw_chunks if len(chunk.strip()) > 0)
+    return chunks
+
+
+def segment_comments(comments, batch_size=256, n_process=1):
+    # Segmentation stage on its own: one nlp.pipe pass over every comment.
+    # pipe() is lazy, so spaCy's share is the loop time minus the regex chunking.
+    start = time.perf_counter()
+    chunk_seconds = 0.0
+    comment_chunks = []
+    for doc in get_nlp().pipe(comments, batch_size=batch_size, n_process=n_process):
+        chunk_start = time.perf_counter()
+        comment_chunks.append(split_into_chunks(doc))
+        chunk_seconds += time.perf_counter() - chunk_start
+
+    report.add_time('spacy', time.perf_counter() - start - chunk_seconds)
+    report.add_time('chunking', chunk_seconds)
+    return comment_chunks
+
+
+MENTION_COLUMNS = ['row', 'islander', 'sentiment']
+
+
+def batch_targeted_mentions(comments, islanders, batch_size=64, max_batch_tokens=8192, n_process=1):
+    # Long-format output: one (row, islander, sentiment) record per islander a comment mentions,
+    # where row is the comment's position in `comments`
+    name_index = as_name_index(islanders)
+
+    comment_chunks = segment_comments(comments, n_process=n_process)
+
+    # Collect every chunk that names an islander so the model runs on full batches of useful chunks
+    flat_chunks, chunk_rows, chunk_names = [], [], []
+    with report.stage('name_matching'):
+        for row, chunks in enumerate(comment_chunks):
+            for chunk in chunks:
+                names = name_index.find(chunk)
+                if names:
+                    flat_chunks.append(chunk)
+                    chunk_rows.append(row)
+                    chunk_names.append(names)
+
+    report.count('comments', len(comment_chunks))
+    report.count('chunks', sum(len(chunks) for chunks in comment_chunks))
+    report.count('matched_chunks', len(flat_chunks))
+    compounds = get_sentiment_scores(flat_chunks, batch_size=batch_size, max_batch_tokens=max_batch_tokens)
+
+    # One record per (chunk, name), averaged per (comment, islander). sort=False keeps comments in order
+    # and islanders in the order they are first mentioned.
+    repeats = np.array([len(names) for names in chunk_names], dtype=np.int64)
+    return (
+        pd.DataFrame({
+            'row': np.repeat(np.array(chunk_rows, dtype=np.int64), repeats),
+            'islander': pd.Series([name for names in chunk_names for name in names], dtype=object),
+            'sentiment': np.repeat(np.asarray(compounds, dtype=np.float64), repeats)
+        })
+        .groupby(['row', 'islander'], sort=False)['sentiment']
+        .mean()
+        .reset_index()
+    )
 
 
 # Load Data
 
 # all_comments = pd.read_parquet('../data/season7_all_episode_comments.parquet')
 # episode_airdates = scrape_airdates(7)
+# islanders = scrape_islanders(7)['name'].to_list()
 
-islanders = scrape_islanders(7)['name'].to_list()
+EPISODE_PATTERN = r'Episode (\d+)'
 
 def extract_episode_number(title):
-    match = re.search(r'Episode (\d+)', title)
+    match = re.search(EPISODE_PATTERN, title)
     if match:
         return int(match.group(1))
     return None
 
+def reshape_mentions(comments, mentions, episode_airdates):
+    # Comment columns are gathered with one positional take, episode numbers come from one
+    # str.extract and airdates from one merge; no per-row Python and no object dict column
+    comments = comments.drop(columns=['islander_sentiment'], errors='ignore').reset_index(drop=True)
+    return (
+        comments
+        .take(mentions['row'].to_numpy())
+        .reset_index(drop=True)
+        .assign(
+            islander=mentions['islander'].to_numpy(),
+            sentiment=mentions['sentiment'].to_numpy(),
+            episode_num=lambda x: pd.to_numeric(x.episode_title.str.extract(EPISODE_PATTERN, expand=False))
+        )
+        .merge(episode_airdates[['episode_num', 'airdate']], on='episode_num', how='left')
+    )
+
+def sentiment_dicts_to_mentions(islander_sentiment):
+    # Older frames carry one {islander: sentiment} dict per comment, sometimes stringified
+    rows, names, scores = [], [], []
+    for row, value in enumerate(islander_sentiment):
+        if isinstance(value, str):
+            value = ast.literal_eval(value)
+        if isinstance(value, dict):
+            for name, score in value.items():
+                rows.append(row)
+                names.append(name)
+                scores.append(score)
+    return pd.DataFrame({
+        'row': np.array(rows, dtype=np.int64),
+        'islander': pd.Series(names, dtype=object),
+        'sentiment': np.array(scores, dtype=np.float64)
+    })
+
 # li_initial = all_comments\
 #     .assign(
 #         islander_sentiment = lambda x: x.comment.apply(lambda x: targeted_sentiment(x,islanders))
@@ -1,13 +1,18 @@
 import pandas as pd
 import re
+from functools import partial
+from metadata_cache import FORCE_REFRESH, cached_season_table
+from seasons import DEFAULT_SHOW, get_season
 
-def scrape_islanders(season_num):
-    url = f'https://en.wikipedia.org/wiki/Love_Island_(American_TV_series)_season_{season_num}'
-    tables = pd.read_html(url)
-    islanders = pd.DataFrame(tables[1])
+def scrape_islanders(season_num, show=DEFAULT_SHOW, force_refresh=FORCE_REFRESH):
+    parse = partial(parse_islanders, table_index=get_season(show, season_num)['islander_table'])
+    return cached_season_table(show, season_num, "islanders", parse, force_refresh=force_refresh)
+
+def parse_islanders(tables, table_index=1):
+    islanders = pd.DataFrame(tables[table_index])
 
     islanders['name'] = islanders['Islander'].apply(
         lambda x: re.search(r'["“](.*?)["”]', x).group(1) if any(char in x for char in ['"', '“']) else x.split()[0]
     )
 
-    return islanders
\ No newline at end of file
+    return islanders
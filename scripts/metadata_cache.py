@@ -0,0 +1,133 @@
+import io
+import os
+import gzip
+import json
+import time
+import hashlib
+import requests
+import pandas as pd
+from seasons import get_season, season_key
+
+METADATA_DIR = "data/metadata"
+HTML_CACHE_DIR = "data/cache/metadata"
+WIKI_URL = 'https://en.wikipedia.org/wiki/{page}'
+
+# Wikipedia is revalidated at most once a day unless a refresh is forced
+DEFAULT_TTL = 24 * 3600
+
+# LI_OFFLINE=1: never touch the network, serve Wikipedia tables from the last saved copy
+OFFLINE = os.getenv("LI_OFFLINE") == "1"
+# LI_REFRESH_METADATA=1: ignore the TTL and re-download the page
+FORCE_REFRESH = os.getenv("LI_REFRESH_METADATA") == "1"
+
+
+# Every file is named by the season key (e.g. usa_s7), so seasons of different shows never collide.
+# data/metadata holds what the page said (committed, so offline runs work from a fresh checkout);
+# data/cache/metadata holds when and how it was last checked, which changes on every revalidation.
+
+def meta_path(key):
+    return os.path.join(METADATA_DIR, f"{key}.json")
+
+
+def state_path(key):
+    return os.path.join(HTML_CACHE_DIR, f"{key}.json")
+
+
+def html_path(key):
+    return os.path.join(HTML_CACHE_DIR, f"{key}.html.gz")
+
+
+def load_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def season_page(show, season_num, ttl=DEFAULT_TTL, force_refresh=FORCE_REFRESH):
+    # Returns the page metadata, downloading or revalidating the HTML only when it is due
+    key = season_key(show, season_num)
+    meta = load_json(meta_path(key))
+    state = load_json(state_path(key))
+    have_html = os.path.exists(html_path(key))
+    if OFFLINE:
+        return meta
+
+    revalidate = meta and state and have_html and not force_refresh
+    if revalidate and time.time() - state['fetched_at'] < ttl:
+        return meta
+
+    url = WIKI_URL.format(page=get_season(show, season_num)['wiki_page'])
+    headers = {'User-Agent': "loveisland-sentiment"}
+    if revalidate:
+        # Conditional GET: an unchanged page costs a 304 and no body
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+
+    try:
+        response = requests.get(url, headers=headers, timeout=30)
+    except requests.RequestException as e:
+        if meta and have_html:
+            print(f"⚠️ Could not revalidate {key} page ({e}). Using the cached copy.")
+            return meta
+        raise
+
+    if response.status_code == 304:
+        state['fetched_at'] = time.time()
+        save_json(state_path(key), state)
+        return meta
+
+    response.raise_for_status()
+    os.makedirs(HTML_CACHE_DIR, exist_ok=True)
+    with gzip.open(html_path(key), "wt", encoding="utf-8") as f:
+        f.write(response.text)
+    save_json(state_path(key), {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'fetched_at': time.time()
+    })
+    print(f"🌐 Downloaded {key} Wikipedia page")
+
+    version = hashlib.sha1(response.text.encode("utf-8")).hexdigest()[:12]
+    if meta and meta['version'] == version and meta['url'] == url:
+        return meta
+    meta = {
+        'url': url,
+        'version': version,
+        # Which page version each parsed table was built from
+        'tables': (meta or {}).get('tables', {})
+    }
+    save_json(meta_path(key), meta)
+    return meta
+
+
+def cached_season_table(show, season_num, name, parse, ttl=DEFAULT_TTL, force_refresh=FORCE_REFRESH):
+    # One HTML download serves every table parsed from the same season page
+    key = season_key(show, season_num)
+    table_path = os.path.join(METADATA_DIR, f"{name}_{key}.parquet")
+    meta = season_page(show, season_num, ttl, force_refresh)
+
+    if OFFLINE or (meta and meta.get('tables', {}).get(name) == meta.get('version') and os.path.exists(table_path)):
+        if not os.path.exists(table_path):
+            raise FileNotFoundError(f"❌ Offline mode: no cached copy of {name} at {table_path}. Run once online first.")
+        return pd.read_parquet(table_path)
+
+    with gzip.open(html_path(key), "rt", encoding="utf-8") as f:
+        tables = pd.read_html(io.StringIO(f.read()))
+    table = parse(tables)
+
+    os.makedirs(METADATA_DIR, exist_ok=True)
+    table.to_parquet(table_path, index=False)
+    meta['tables'][name] = meta['version']
+    save_json(meta_path(key), meta)
+    return table
@@ -0,0 +1,72 @@
+import os
+import time
+import atexit
+from functools import lru_cache
+from metadata_cache import OFFLINE
+
+MODEL_ID = "cardiffnlp/twitter-roberta-base-sentiment"
+# torch (fp32), torch-int8, onnx or onnx-int8
+DEFAULT_BACKEND = os.getenv("SENTIMENT_BACKEND", "torch")
+
+# Everything heavy (torch, transformers, spaCy, the SQLite cache) is imported and loaded on first
+# use, so importing the pipeline modules for a helper like extract_episode_number costs next to nothing
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer():
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(MODEL_ID, local_files_only=OFFLINE)
+
+
+@lru_cache(maxsize=None)
+def get_model():
+    from transformers import AutoModelForSequenceClassification
+    return AutoModelForSequenceClassification.from_pretrained(MODEL_ID, local_files_only=OFFLINE)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    from inference_backends import load_backend
+    return load_backend(DEFAULT_BACKEND, get_model(), MODEL_ID)
+
+
+def prepare_backend():
+    # ONNX exports are written here, in the parent, before pool workers start and try to load them
+    from inference_backends import export_onnx
+    if DEFAULT_BACKEND in ('onnx', 'onnx-int8'):
+        export_onnx(get_model(), MODEL_ID, quantize=(DEFAULT_BACKEND == 'onnx-int8'))
+
+
+@lru_cache(maxsize=None)
+def get_sentiment_cache():
+    from sentiment_cache import SentimentCache
+    # Chunk scores persist across runs, keyed by normalized chunk text + model id.
+    # Non-default backends get their own namespace so quantized scores never mix with fp32 ones.
+    # Named from the configured backend, so a fully cached run never loads the model at all.
+    cache = SentimentCache(MODEL_ID if DEFAULT_BACKEND == 'torch' else f"{MODEL_ID}:{DEFAULT_BACKEND}")
+    # Trims the table back to max_entries when the process (or pool worker) exits
+    atexit.register(cache.close)
+    return cache
+
+
+@lru_cache(maxsize=None)
+def get_nlp():
+    import spacy
+    # Only sentence boundaries are used, so run the statistical senter instead of the full tagger/parser/NER stack
+    nlp = spacy.load("en_core_web_sm", exclude=["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "ner"])
+    nlp.enable_pipe("senter")
+    return nlp
+
+
+def warm_up():
+    # Explicitly load everything up front, e.g. before the first batch or in a pool worker
+    for name, loader in [
+        ('tokenizer', get_tokenizer),
+        ('model', get_model),
+        ('backend', get_backend),
+        ('chunk cache', get_sentiment_cache),
+        ('spaCy', get_nlp)
+    ]:
+        start = time.perf_counter()
+        loader()
+        print(f"🔥 Loaded {name} in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,32 @@
+import re
+
+
+class NameIndex:
+    def __init__(self, names, pattern, surface_to_name):
+        self.names = names
+        self.pattern = pattern
+        self.surface_to_name = surface_to_name
+        self.order = {name: i for i, name in enumerate(names)}
+
+    def find(self, text):
+        # Canonical names mentioned in text, in islander-list order
+        found = {self.surface_to_name[m.group(0).lower()] for m in self.pattern.finditer(text)}
+        return sorted(found, key=self.order.get)
+
+
+def build_name_index(islanders, aliases=None):
+    # aliases: {canonical name: [other spellings]}, per season from the season registry
+    aliases = aliases or {}
+    names = list(islanders)
+    surface_to_name = {}
+    for name in names:
+        surface_to_name[name.lower()] = name
+        for alias in aliases.get(name, []):
+            surface_to_name[alias.lower()] = name
+
+    # One alternation, longest surface first so 'Belle-A' wins over any shorter prefix.
+    # Lookarounds instead of \b because names can start or end with punctuation.
+    alternation = "|".join(re.escape(surface) for surface in sorted(surface_to_name, key=len, reverse=True))
+    pattern = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)", re.IGNORECASE)
+
+    return NameIndex(names, pattern, surface_to_name)
@@ -0,0 +1,61 @@
+import os
+import multiprocessing as mp
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from run_report import report
+
+DEFAULT_WORKERS = int(os.getenv("SENTIMENT_WORKERS", "1"))
+DEFAULT_TORCH_THREADS = os.getenv("SENTIMENT_TORCH_THREADS")
+
+worker_sentiment = None
+
+
+def _init_worker(torch_threads):
+    global worker_sentiment
+    import torch
+    # One intra-op pool per worker; N workers x all cores would just oversubscribe the CPU
+    torch.set_num_threads(torch_threads)
+
+    # Load the tokenizer, model, spaCy pipeline and chunk cache once for this worker
+    import initial_sentiment
+    from model_registry import warm_up
+    warm_up()
+    worker_sentiment = initial_sentiment
+
+
+def _score_shard(comments, islanders):
+    # Each shard ships its own stage timings back so the parent's run report covers the workers
+    from run_report import report
+    report.reset()
+    mentions = worker_sentiment.batch_targeted_mentions(comments, islanders)
+    return mentions, report.snapshot()
+
+
+def open_pool(n_workers=None, torch_threads=None):
+    n_workers = n_workers or DEFAULT_WORKERS
+    if torch_threads is None:
+        torch_threads = int(DEFAULT_TORCH_THREADS or max(1, (os.cpu_count() or 1) // n_workers))
+
+    from model_registry import prepare_backend
+    prepare_backend()
+
+    # spawn so each worker opens its own model and SQLite handles instead of inheriting the parent's
+    return ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(torch_threads,)
+    )
+
+
+def iter_pool_mentions(pool, comments, islanders, shard_size=500):
+    comments = list(comments)
+    starts = range(0, len(comments), shard_size)
+    shards = [comments[start:start + shard_size] for start in starts]
+
+    # map yields shard results in submission order, so output order never depends on timing.
+    # Shard rows are shifted back to positions in `comments`.
+    for start, (shard_mentions, shard_report) in zip(starts, pool.map(_score_shard, shards, repeat(islanders))):
+        report.merge(shard_report)
+        yield shard_mentions.assign(row=shard_mentions['row'] + start)
+
@@ -0,0 +1,231 @@
+import os
+import time
+import random
+import asyncio
+import httpx
+from run_report import report
+
+REDDIT_OAUTH_URL = "https://oauth.reddit.com"
+REDDIT_TOKEN_URL = "https://www.reddit.com/api/v1/access_token"
+
+# /api/morechildren accepts at most 100 comment ids per call
+MORECHILDREN_BATCH = 100
+
+
+class TokenBucket:
+    # Refill rate follows Reddit's X-Ratelimit-Remaining / X-Ratelimit-Reset headers, so we spend
+    # exactly the budget Reddit says we have instead of sleeping a fixed few seconds per thread
+    def __init__(self, rate=1.0, capacity=10):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def update_from_headers(self, headers):
+        remaining = headers.get('x-ratelimit-remaining')
+        reset = headers.get('x-ratelimit-reset')
+        if remaining is None or reset is None:
+            return
+        remaining = float(remaining)
+        reset = max(float(reset), 1.0)
+        self._refill()
+        # Spread what is left of the window evenly over the time until it resets
+        self.rate = max(remaining, 1.0) / reset
+        self.tokens = min(self.tokens, remaining)
+
+
+class HttpxTransport:
+    # One persistent connection pool for the whole run. Point base_url at a local
+    # fake server (and pass token_url=None) to run the fetcher without touching Reddit.
+    def __init__(self, client_id=None, client_secret=None, user_agent=None,
+                 base_url=REDDIT_OAUTH_URL, token_url=REDDIT_TOKEN_URL):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.base_url = base_url
+        self.token_url = token_url
+        self.token = None
+        self.client = httpx.AsyncClient(
+            headers={'User-Agent': user_agent or "loveisland-sentiment"},
+            timeout=30
+        )
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        return cls(
+            client_id=os.getenv("REDDIT_CLIENT_ID"),
+            client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
+            user_agent=os.getenv("REDDIT_USER_AGENT"),
+            **kwargs
+        )
+
+    async def authenticate(self):
+        if self.token_url is None:
+            return
+        response = await self.client.post(
+            self.token_url,
+            auth=(self.client_id, self.client_secret),
+            data={'grant_type': 'client_credentials'}
+        )
+        response.raise_for_status()
+        self.token = response.json()['access_token']
+
+    async def get(self, path, params=None):
+        if self.token is None and self.token_url is not None:
+            await self.authenticate()
+        headers = {'Authorization': f"bearer {self.token}"} if self.token else {}
+        response = await self.client.get(f"{self.base_url}{path}", params=params, headers=headers)
+        if response.status_code == 401 and self.token_url is not None:
+            # App-only tokens last an hour; refresh once and retry
+            await self.authenticate()
+            headers = {'Authorization': f"bearer {self.token}"}
+            response = await self.client.get(f"{self.base_url}{path}", params=params, headers=headers)
+        payload = response.json() if response.status_code == 200 else None
+        return response.status_code, response.headers, payload
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def comment_record(data):
+    return {
+        'comment_id': data['id'],
+        'comment': data.get('body', ''),
+        'score': data.get('score', 0),
+        'created_utc': data.get('created_utc'),
+        'author': str(data.get('author'))
+    }
+
+
+class AsyncRedditFetcher:
+    def __init__(self, transport, bucket=None, max_retries=5, backoff_base=2.0, backoff_cap=60.0):
+        self.transport = transport
+        self.bucket = bucket or TokenBucket()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+    async def request(self, path, params=None):
+        for attempt in range(self.max_retries):
+            await self.bucket.acquire()
+            report.count('http_requests')
+            try:
+                # Summed request latency; requests overlap, so this can exceed the run's wall time
+                with report.stage('http_request'):
+                    status, headers, payload = await self.transport.get(path, params)
+            except httpx.TransportError as e:
+                status, headers, payload = None, {}, None
+                print(f"⚠️ Network error on {path}: {e}")
+
+            if status == 200:
+                self.bucket.update_from_headers(headers)
+                return payload
+
+            if status is not None and status != 429 and status < 500:
+                raise RuntimeError(f"Reddit returned {status} for {path}")
+
+            self.bucket.update_from_headers(headers)
+            # Jittered exponential backoff; Retry-After wins when Reddit sends one
+            delay = min(self.backoff_cap, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.5)
+            retry_after = headers.get('retry-after')
+            if retry_after is not None:
+                delay = max(delay, float(retry_after))
+            print(f"🛑 {status or 'No response'} on {path}. Backing off {delay:.1f}s (attempt {attempt + 1})")
+            report.count('http_retries')
+            with report.stage('http_backoff'):
+                await asyncio.sleep(delay)
+
+        raise RuntimeError(f"Failed all {self.max_retries} retries for {path}")
+
+    async def iter_submission_comments(self, post_id, threshold=5):
+        # Yields pages of comment records: the first listing, then one page per morechildren call.
+        # threshold mirrors praw's replace_more(threshold=...): smaller "more" stubs are left alone.
+        listing = await self.request(f"/comments/{post_id}", {'limit': 500, 'raw_json': 1})
+        pending = []
+
+        def collect(children, page):
+            for child in children:
+                if child['kind'] == 't1':
+                    page.append(comment_record(child['data']))
+                    replies = child['data'].get('replies')
+                    if replies:
+                        collect(replies['data']['children'], page)
+                elif child['kind'] == 'more' and child['data'].get('count', 0) >= threshold:
+                    pending.extend(child['data']['children'])
+
+        page = []
+        collect(listing[1]['data']['children'], page)
+        yield page
+
+        while pending:
+            batch, pending = pending[:MORECHILDREN_BATCH], pending[MORECHILDREN_BATCH:]
+            response = await self.request('/api/morechildren', {
+                'api_type': 'json',
+                'link_id': f"t3_{post_id}",
+                'children': ",".join(batch),
+                'raw_json': 1
+            })
+            page = []
+            # morechildren returns a flat list, so replies arrive as their own things
+            collect(response['json']['data']['things'], page)
+            yield page
+
+
+    async def iter_subreddit_comments(self, subreddit, max_pages=10):
+        # Newest-first comments across the whole subreddit; Reddit keeps roughly the last 1000
+        after = None
+        for _ in range(max_pages):
+            params = {'limit': 100, 'raw_json': 1}
+            if after:
+                params['after'] = after
+            listing = await self.request(f"/r/{subreddit}/comments", params)
+            children = listing['data']['children']
+            yield [{**comment_record(c['data']), 'link_id': c['data']['link_id']} for c in children]
+            after = listing['data'].get('after')
+            if not after or not children:
+                return
+
+
+async def _download_all(fetcher, threads, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def download(thread):
+        async with semaphore:
+            try:
+                comments = []
+                async for page in fetcher.iter_submission_comments(thread['post_id']):
+                    comments.extend(page)
+                return thread, comments
+            except Exception as e:
+                print(f"❌ Failed to download {thread['title']}: {e}")
+                return thread, None
+
+    return await asyncio.gather(*(download(thread) for thread in threads))
+
+
+def download_threads(threads, concurrency=4, max_retries=5, transport=None):
+    # threads: [{'post_id': ..., 'title': ...}]. Returns [(thread, comment records or None)] in input order.
+    async def run():
+        active_transport = transport or HttpxTransport.from_env()
+        try:
+            fetcher = AsyncRedditFetcher(active_transport, max_retries=max_retries)
+            return await _download_all(fetcher, threads, concurrency)
+        finally:
+            if transport is None:
+                await active_transport.aclose()
+
+    return asyncio.run(run())
@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import cProfile
+import threading
+import datetime as dt
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is simply left out of the report there
+    resource = None
+
+REPORTS_DIR = "data/store/runs"
+
+# LI_PROFILE=<path>: run the pipeline under cProfile and dump pstats to <path> (snakeviz / pstats can read it).
+# For pool workers use py-spy instead: py-spy record --subprocesses -- python scripts/sentiment_update.py
+PROFILE_PATH = os.getenv("LI_PROFILE")
+
+
+def peak_rss_mb(who=None):
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(who if who is not None else resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RunReport:
+    # Per-stage wall time, counters and value distributions for one pipeline run.
+    # Stages can be recorded from the fetcher thread too, so every update takes the lock.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.started_at = dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds')
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.distributions = {}
+        self.worker_peak_rss_mb = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds, calls=1):
+        with self.lock:
+            stage = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            stage['seconds'] += seconds
+            stage['calls'] += calls
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        with self.lock:
+            dist = self.distributions.setdefault(name, {'count': 0, 'sum': 0, 'min': value, 'max': value})
+            dist['count'] += 1
+            dist['sum'] += value
+            dist['min'] = min(dist['min'], value)
+            dist['max'] = max(dist['max'], value)
+
+    def snapshot(self):
+        # Raw numbers only, so a pool worker can ship its shard's report back to the parent
+        with self.lock:
+            return {
+                'stages': {name: dict(stage) for name, stage in self.stages.items()},
+                'counters': dict(self.counters),
+                'distributions': {name: dict(dist) for name, dist in self.distributions.items()},
+                'peak_rss_mb': peak_rss_mb()
+            }
+
+    def merge(self, snapshot):
+        for name, stage in snapshot['stages'].items():
+            self.add_time(name, stage['seconds'], stage['calls'])
+        for name, n in snapshot['counters'].items():
+            self.count(name, n)
+        with self.lock:
+            for name, dist in snapshot['distributions'].items():
+                mine = self.distributions.setdefault(name, {'count': 0, 'sum': 0, 'min': dist['min'], 'max': dist['max']})
+                mine['count'] += dist['count']
+                mine['sum'] += dist['sum']
+                mine['min'] = min(mine['min'], dist['min'])
+                mine['max'] = max(mine['max'], dist['max'])
+            if snapshot['peak_rss_mb'] is not None:
+                self.worker_peak_rss_mb = max(self.worker_peak_rss_mb or 0, snapshot['peak_rss_mb'])
+
+    def summary(self):
+        raw = self.snapshot()
+        wall = time.perf_counter() - self.start
+        counters = raw['counters']
+        comments = counters.get('comments', 0)
+        lookups = counters.get('cache_hits', 0) + counters.get('cache_misses', 0)
+        return {
+            'started_at': self.started_at,
+            'wall_seconds': round(wall, 3),
+            # Stage seconds are summed across calls (and across workers / concurrent requests),
+            # so in a parallel run they can add up to more than the wall time
+            'stages': {name: {'seconds': round(s['seconds'], 3), 'calls': s['calls']} for name, s in raw['stages'].items()},
+            'counters': counters,
+            'distributions': {
+                name: {**dist, 'mean': dist['sum'] / dist['count']} for name, dist in raw['distributions'].items()
+            },
+            'comments_per_second': comments / wall if wall else None,
+            'chunks_per_comment': counters.get('chunks', 0) / comments if comments else None,
+            'cache_hit_rate': counters.get('cache_hits', 0) / lookups if lookups else None,
+            'peak_rss_mb': raw['peak_rss_mb'],
+            'worker_peak_rss_mb': self.worker_peak_rss_mb
+        }
+
+    def write(self, name, reports_dir=REPORTS_DIR, **extra):
+        summary = {**extra, **self.summary()}
+        os.makedirs(reports_dir, exist_ok=True)
+        path = os.path.join(reports_dir, f"{name}.json")
+        with open(path, "w") as f:
+            json.dump(summary, f, indent=2)
+
+        slowest = sorted(summary['stages'].items(), key=lambda item: -item[1]['seconds'])[:5]
+        print(f"📊 {name}: {summary['counters'].get('comments', 0)} comments in {summary['wall_seconds']:.1f}s | "
+              + " | ".join(f"{stage} {s['seconds']:.1f}s" for stage, s in slowest))
+        print(f"📊 Run report written to {path}")
+        return summary
+
+
+# One report per process; pipeline entry points reset it at the start of a run
+report = RunReport()
+
+
+@contextmanager
+def profiled(path=PROFILE_PATH):
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"🔬 cProfile stats written to {path}")
@@ -0,0 +1,51 @@
+DEFAULT_SHOW = "usa"
+
+# Every show / season the pipeline knows about. Adding a season is one entry here: its Reddit threads,
+# Wikipedia page and raw comment folder are all looked up from it, and its store partitions, aggregates
+# and summaries are kept apart from every other season's.
+SEASONS = [
+    {
+        'show': "usa",
+        'season': 7,
+        'show_name': "Love Island USA",
+        'title': "Love Island USA Season 7",
+        'subreddit': "LoveIslandUSA",
+        # Reddit search query, and the text an episode discussion thread's title must contain
+        'thread_query': "Season 7 Episode",
+        'thread_title': "Post Episode Discussion",
+        'wiki_page': "Love_Island_(American_TV_series)_season_7",
+        # Episodes air at this local time on their airdate; the reaction timeline counts from here
+        'air_time': "21:00",
+        'timezone': "America/New_York",
+        # Positions of the islander and episode tables on the Wikipedia page
+        'islander_table': 1,
+        'episode_table': 3,
+        # How the subreddit actually writes some islanders, mapped to the canonical (Wikipedia) name
+        'aliases': {
+            'Belle-A': ['Belle A', 'BelleA'],
+        },
+        'raw_folder': "data/season7_comments",
+        # Inactive seasons stay queryable but are no longer synced
+        'active': True
+    }
+]
+
+
+def season_key(show, season):
+    return f"{show}_s{season}"
+
+
+def get_season(show, season):
+    for entry in SEASONS:
+        if entry['show'] == show and entry['season'] == season:
+            return entry
+    raise KeyError(f"❌ Unknown season {season_key(show, season)}. Add it to SEASONS in scripts/seasons.py")
+
+
+def airing(show, season):
+    entry = get_season(show, season)
+    return {'air_time': entry['air_time'], 'timezone': entry['timezone']}
+
+
+def active_seasons():
+    return [entry for entry in SEASONS if entry['active']]
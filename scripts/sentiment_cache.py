@@ -0,0 +1,110 @@
+import os
+import time
+import sqlite3
+import hashlib
+
+DEFAULT_CACHE_PATH = "data/cache/chunk_sentiment.sqlite"
+
+# SQLite caps the number of bound parameters per statement
+LOOKUP_BATCH = 500
+# The size check is a full COUNT(*), so it runs once per this many inserts and on close(),
+# letting the table overshoot max_entries by at most this much in between
+EVICT_EVERY = 10_000
+
+
+def normalize_chunk(text):
+    # Collapse whitespace so quoted / copy-pasted chunks land on the same key.
+    # Only the key is normalized; callers score and look up the original text.
+    return " ".join(text.split())
+
+
+def chunk_key(text, model_id):
+    return hashlib.sha1(f"{model_id}\0{normalize_chunk(text)}".encode("utf-8")).hexdigest()
+
+
+class SentimentCache:
+    def __init__(self, model_id, path=DEFAULT_CACHE_PATH, max_entries=500_000):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self.inserts_since_evict = 0
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_sentiment (
+                key TEXT PRIMARY KEY,
+                negative REAL,
+                neutral REAL,
+                positive REAL,
+                last_used REAL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON chunk_sentiment (last_used)")
+        self.conn.commit()
+
+    def get_many(self, texts):
+        # Returns {text: scores} for every text already scored with this model.
+        # Texts differing only in whitespace share a key, so each key maps back to all of them.
+        keys = {}
+        for text in set(texts):
+            keys.setdefault(chunk_key(text, self.model_id), []).append(text)
+        found = {}
+        key_list = list(keys)
+        for start in range(0, len(key_list), LOOKUP_BATCH):
+            batch = key_list[start:start + LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT key, negative, neutral, positive FROM chunk_sentiment WHERE key IN ({placeholders})",
+                batch
+            ).fetchall()
+            for key, negative, neutral, positive in rows:
+                for text in keys[key]:
+                    found[text] = {
+                        'negative': negative,
+                        'neutral': neutral,
+                        'positive': positive,
+                        'compound': positive - negative
+                    }
+
+        if found:
+            # Touch hits so eviction drops the least recently used chunks first
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE chunk_sentiment SET last_used = ? WHERE key = ?",
+                [(now, key) for key in {chunk_key(text, self.model_id) for text in found}]
+            )
+            self.conn.commit()
+        return found
+
+    def put_many(self, scored):
+        # scored: {text: {'negative', 'neutral', 'positive', ...}}
+        if not scored:
+            return
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO chunk_sentiment (key, negative, neutral, positive, last_used) VALUES (?, ?, ?, ?, ?)",
+            [
+                (chunk_key(text, self.model_id), s['negative'], s['neutral'], s['positive'], now)
+                for text, s in scored.items()
+            ]
+        )
+        self.conn.commit()
+        self.inserts_since_evict += len(scored)
+        if self.inserts_since_evict >= EVICT_EVERY:
+            self.evict()
+
+    def evict(self):
+        self.inserts_since_evict = 0
+        count = self.conn.execute("SELECT COUNT(*) FROM chunk_sentiment").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self.conn.execute(
+                "DELETE FROM chunk_sentiment WHERE key IN "
+                "(SELECT key FROM chunk_sentiment ORDER BY last_used LIMIT ?)",
+                (overflow,)
+            )
+            self.conn.commit()
+
+    def close(self):
+        self.evict()
+        self.conn.close()
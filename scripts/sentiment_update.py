@@ -1,46 +1,84 @@
-import pandas as pd
-import ast
-from reddit_api import reddit , update_with_new_episodes
-from initial_sentiment import targeted_sentiment, extract_episode_number
+import os
+from reddit_api import reddit , find_new_episode_threads
+from initial_sentiment import extract_episode_number
+from parallel_sentiment import DEFAULT_WORKERS
+from streaming_pipeline import stream_sentiment
+from delta_sync import sync_active_threads
 from airdate_scrape import scrape_airdates
 from islander_scrape import scrape_islanders
+from name_matcher import build_name_index
+from model_registry import warm_up
+from run_report import profiled
+from data_store import read_aggregates, read_top_comments
+from seasons import active_seasons, season_key
 
-def apply_sentiment():
-
-    comment_update = update_with_new_episodes(reddit)
-    episode_airdates = scrape_airdates(7)
-    islanders = scrape_islanders(7)['name'].to_list()
-
-    li_update = (
-        comment_update
-        .assign(
-            islander_sentiment=lambda x: x.comment.apply(lambda c: targeted_sentiment(c, islanders))
-        )
-        .assign(
-            islander_sentiment=lambda df: df['islander_sentiment'].apply(
-                lambda x: ast.literal_eval(x) if isinstance(x, str) else x
-            )
-        )
-        .loc[lambda df: df['islander_sentiment'].apply(lambda x: isinstance(x, dict) and len(x) > 0)]
-        .assign(
-            islander_sentiment_items=lambda df: df['islander_sentiment'].apply(lambda d: list(d.items()))
-        )
-        .explode('islander_sentiment_items')
-        .assign(
-            islander=lambda df: df['islander_sentiment_items'].apply(lambda x: x[0]),
-            sentiment=lambda df: df['islander_sentiment_items'].apply(lambda x: x[1])
-        )
-        .drop(columns=['islander_sentiment_items'])
-        .assign(
-            episode_num=lambda x: x.episode_title.apply(extract_episode_number)
-        )
-        .merge(episode_airdates[['episode_num', 'airdate']], on='episode_num', how='left')
-    )
+def apply_sentiment(n_workers=DEFAULT_WORKERS, torch_threads=None, batch_size=2000, resync_max_age_days=7):
+
+    for entry in active_seasons():
+        show, season = entry['show'], entry['season']
+        print(f"📺 Updating {entry['title']}")
+
+        episode_airdates = scrape_airdates(season, show)
+        # Built once per season; every chunk is matched against this single compiled pattern
+        islanders = build_name_index(scrape_islanders(season, show)['name'].to_list(), entry['aliases'])
+
+        threads = find_new_episode_threads(reddit, show, season)
+        if threads:
+            print(f"🆕 Found {len(threads)} new episodes. Streaming them through sentiment scoring...")
+            stream_new_episodes(threads, islanders, episode_airdates, show, season, n_workers, torch_threads, batch_size)
+        else:
+            print("✅ No new episodes to update.")
 
-    max_episode = li_update['episode_num'].max()
+        # Threads that are still active keep collecting comments after their first download
+        sync_active_threads(islanders, episode_airdates, show, season, max_age_days=resync_max_age_days)
 
-    li_update.to_parquet(f'data/comment_updates/li_comments_{max_episode}.parquet', index=False)
+        # Summaries are generated here, once per day, so dashboard clicks are cache lookups
+        refresh_summaries(show, season)
 
     return 
 
-apply_sentiment()
\ No newline at end of file
+def refresh_summaries(show, season):
+    # Imported here: it pulls in streamlit and the Gemini client, which pool workers re-importing
+    # this module as __mp_main__ have no use for
+    from summarizer import api_key, load_summarizer, SummaryCache, pregenerate_summaries
+
+    if not api_key and os.getenv("SUMMARIZER_BACKEND", "gemini") != 'stub':
+        print("⚠️ No GEMINI_API_KEY set. Skipping summary pre-generation.")
+        return
+
+    # The top-comment index already holds every islander's candidates, sorted by score
+    comments = read_top_comments(show=show, season=season)
+    if comments.empty:
+        return
+    latest_episode = int(read_aggregates(show=show, season=season)['episode_num'].max())
+    pregenerate_summaries(comments, load_summarizer(), SummaryCache(), latest_episode, scope=season_key(show, season))
+
+def stream_new_episodes(threads, islanders, episode_airdates, show, season, n_workers, torch_threads, batch_size):
+
+    if n_workers <= 1:
+        # Pool workers warm up on their own; in-process scoring loads everything before the first batch
+        warm_up()
+
+    # Episode numbers come from the thread titles, so the output name is known before any comment arrives
+    max_episode = max(
+        (extract_episode_number(thread['title']) for thread in threads
+         if extract_episode_number(thread['title']) is not None),
+        default=0
+    )
+
+    stream_sentiment(
+        threads,
+        islanders,
+        episode_airdates,
+        show=show,
+        season=season,
+        source=f'li_comments_{max_episode}',
+        batch_size=batch_size,
+        n_workers=n_workers,
+        torch_threads=torch_threads
+    )
+
+if __name__ == "__main__":
+    # LI_PROFILE=run.prof profiles the whole run
+    with profiled():
+        apply_sentiment()
@@ -0,0 +1,110 @@
+import os
+import shutil
+import threading
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from scripts.data_store import (
+    STORE_ROOT, manifest_version, season_dir, read_aggregates, read_top_comments, read_timeline
+)
+
+SNAPSHOT_DIR = "data/cache/snapshots"
+
+# Tables the dashboard reads, and the columns each is sliced by. Every table is written sorted by its
+# slice columns, so any slice is one contiguous row range.
+SNAPSHOT_TABLES = {
+    'aggregates': (read_aggregates, ['islander']),
+    'top_comments': (read_top_comments, ['islander']),
+    'timeline': (read_timeline, ['islander', 'episode_num', 'bucket_minutes'])
+}
+
+
+def write_snapshot(version, show, season, root=STORE_ROOT, snapshot_dir=SNAPSHOT_DIR):
+    # Arrow IPC copies of one season's dashboard tables for one manifest version. Built in a temporary
+    # directory and renamed into place, so a reader sees either the whole snapshot or none of it.
+    path = os.path.join(snapshot_dir, version, season_dir(show, season))
+    if os.path.exists(path):
+        return path
+
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    os.makedirs(tmp_path, exist_ok=True)
+    for name, (read, slice_columns) in SNAPSHOT_TABLES.items():
+        # Stable, so the order each table was stored in (e.g. top comments by score) holds within a slice
+        df = read(root, show, season).sort_values(slice_columns, kind='stable')
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(os.path.join(tmp_path, f"{name}.arrow"), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another thread or process published the same snapshot first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return path
+
+
+def slice_offsets(table, columns):
+    # {key: (start, length)} of every run of equal keys in a table sorted by columns
+    if table.num_rows == 0:
+        return {}
+    keys = list(zip(*(table.column(c).to_pylist() for c in columns)))
+    boundaries = np.flatnonzero([a != b for a, b in zip(keys[:-1], keys[1:])]) + 1
+    starts = np.concatenate([[0], boundaries])
+    lengths = np.diff(np.concatenate([starts, [len(keys)]]))
+    return {keys[start]: (int(start), int(length)) for start, length in zip(starts, lengths)}
+
+
+class SeasonSnapshot:
+    # One season's tables memory-mapped read-only. Pages live in the OS page cache and are shared by every
+    # session, and slices are zero-copy views, so memory does not grow with the number of viewers.
+    def __init__(self, path, version):
+        self.version = version
+        self.tables = {}
+        self.offsets = {}
+        for name, (_, slice_columns) in SNAPSHOT_TABLES.items():
+            source = pa.memory_map(os.path.join(path, f"{name}.arrow"), "r")
+            self.tables[name] = pa.ipc.open_file(source).read_all()
+            self.offsets[name] = slice_offsets(self.tables[name], slice_columns)
+
+        aggregates = self.tables['aggregates']
+        self.islanders = sorted({key[0] for key in self.offsets['aggregates']})
+        self.latest_episode = pc.max(aggregates['episode_num']).as_py() if aggregates.num_rows else None
+
+    def slice(self, name, *key):
+        start, length = self.offsets[name].get(key, (0, 0))
+        return self.tables[name].slice(start, length)
+
+
+class SharedSnapshots:
+    # Process-wide holder (one per Streamlit server via st.cache_resource). When the manifest version changes
+    # the next request builds the new snapshot and swaps it in with a single assignment; sessions still
+    # holding the old one finish with it and it is freed once they let go.
+    def __init__(self, root=STORE_ROOT, snapshot_dir=SNAPSHOT_DIR):
+        self.root = root
+        self.snapshot_dir = snapshot_dir
+        self.lock = threading.Lock()
+        self.current = {}
+
+    def get(self, show, season):
+        version = manifest_version(self.root)
+        snapshot = self.current.get((show, season))
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        with self.lock:
+            snapshot = self.current.get((show, season))
+            if snapshot is None or snapshot.version != version:
+                path = write_snapshot(version, show, season, self.root, self.snapshot_dir)
+                snapshot = SeasonSnapshot(path, version)
+                self.current[(show, season)] = snapshot
+                self.remove_stale(version)
+        return snapshot
+
+    def remove_stale(self, version):
+        # Older versions' files can go once a newer one is live; mapped pages stay valid until unmapped
+        if not os.path.isdir(self.snapshot_dir):
+            return
+        for name in os.listdir(self.snapshot_dir):
+            if name != version:
+                shutil.rmtree(os.path.join(self.snapshot_dir, name), ignore_errors=True)
@@ -0,0 +1,190 @@
+import os
+import queue
+import asyncio
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from reddit_async import AsyncRedditFetcher, HttpxTransport
+from initial_sentiment import batch_targeted_mentions, reshape_mentions
+from parallel_sentiment import open_pool, iter_pool_mentions
+from data_store import PartitionWriter
+from comment_filter import CommentFilter
+from run_report import report
+from seasons import airing, season_key
+
+FETCH_DONE = object()
+
+
+def start_fetcher(threads, out_queue, concurrency=4, max_retries=5, transport=None):
+    # Runs the async downloader on its own thread. Pages go into a bounded queue, so when scoring
+    # falls behind the put blocks and downloading pauses instead of piling comments up in memory.
+    async def put(item):
+        await asyncio.to_thread(out_queue.put, item)
+
+    async def fetch_thread(fetcher, thread, semaphore):
+        async with semaphore:
+            try:
+                async for page in fetcher.iter_submission_comments(thread['post_id']):
+                    await put(('page', thread, page))
+                await put(('done', thread, None))
+            except Exception as e:
+                print(f"❌ Failed to download {thread['title']}: {e}")
+                await put(('failed', thread, None))
+
+    async def run():
+        active_transport = transport or HttpxTransport.from_env()
+        try:
+            fetcher = AsyncRedditFetcher(active_transport, max_retries=max_retries)
+            semaphore = asyncio.Semaphore(concurrency)
+            await asyncio.gather(*(fetch_thread(fetcher, thread, semaphore) for thread in threads))
+        finally:
+            if transport is None:
+                await active_transport.aclose()
+            await put(FETCH_DONE)
+
+    fetch_worker = threading.Thread(target=lambda: asyncio.run(run()), daemon=True)
+    fetch_worker.start()
+    return fetch_worker
+
+
+# Raw file columns (reddit_async.comment_record plus the thread), for threads that finish without a comment
+EMPTY_THREAD_SCHEMA = pa.schema([
+    ('comment_id', pa.string()),
+    ('comment', pa.string()),
+    ('score', pa.int64()),
+    ('created_utc', pa.float64()),
+    ('author', pa.string()),
+    ('episode_post_id', pa.string()),
+    ('episode_title', pa.string())
+])
+
+
+class RawThreadWriter:
+    # Appends each thread's raw comments to <filename>.partial. A raw file under its final name marks the
+    # thread as ingested (find_new_episode_threads skips it), so partials are only renamed into place by
+    # publish(), after the thread's scored rows are in the store. A crash before then re-fetches the thread.
+    def __init__(self):
+        self.writers = {}
+        self.counts = {}
+        self.completed = []
+        self.failed = set()
+
+    def handle(self, event, thread, page):
+        post_id = thread['post_id']
+        title_safe = thread['title'].replace('/', '_').replace(':', '').replace('"', '')
+        partial = f"{thread['filename']}.partial"
+
+        if event == 'page' and page:
+            table = pa.Table.from_pylist(
+                [{**c, 'episode_post_id': post_id, 'episode_title': thread['title']} for c in page]
+            )
+            if post_id not in self.writers:
+                self.writers[post_id] = pq.ParquetWriter(partial, table.schema)
+                self.counts[post_id] = 0
+            else:
+                table = table.cast(self.writers[post_id].schema)
+            self.writers[post_id].write_table(table)
+            self.counts[post_id] += len(page)
+
+        elif event == 'done':
+            if post_id in self.writers:
+                self.writers.pop(post_id).close()
+            else:
+                # An empty thread still gets its raw file, or every later run would fetch it again. Its title
+                # goes in the file metadata, so delta sync can still label the comments that arrive later.
+                empty = EMPTY_THREAD_SCHEMA.with_metadata({'episode_title': thread['title']}).empty_table()
+                pq.write_table(empty, partial)
+            self.completed.append(thread['filename'])
+            print(f"✅ Downloaded {self.counts.get(post_id, 0)} comments for: {title_safe}")
+
+        elif event == 'failed':
+            self.failed.add(post_id)
+            if post_id in self.writers:
+                self.writers.pop(post_id).close()
+                os.remove(partial)
+
+    def publish(self):
+        for filename in self.completed:
+            os.replace(f"{filename}.partial", filename)
+        self.completed = []
+
+
+def iter_comment_batches(in_queue, raw_writer, batch_size=2000):
+    # Regroups thread pages into fixed-size record batches for the scorer
+    batch = []
+    while True:
+        # Time spent here is time the scorer sat idle waiting on Reddit
+        with report.stage('fetch_wait'):
+            item = in_queue.get()
+        if item is FETCH_DONE:
+            break
+        event, thread, page = item
+        with report.stage('raw_write'):
+            raw_writer.handle(event, thread, page)
+        if event != 'page':
+            continue
+        report.count('pages')
+        report.count('fetched_comments', len(page))
+
+        batch.extend(
+            {**c, 'episode_post_id': thread['post_id'], 'episode_title': thread['title']}
+            for c in page
+        )
+        while len(batch) >= batch_size:
+            yield pd.DataFrame(batch[:batch_size])
+            batch = batch[batch_size:]
+
+    if batch:
+        yield pd.DataFrame(batch)
+
+
+def stream_sentiment(threads, islanders, episode_airdates, show, season, source,
+                     batch_size=2000, max_queued_pages=32, concurrency=4, max_retries=5,
+                     n_workers=1, torch_threads=None, transport=None):
+    # fetch -> segment + score -> reshape -> parquet, one bounded record batch at a time
+    report.reset()
+    page_queue = queue.Queue(maxsize=max_queued_pages)
+    fetch_worker = start_fetcher(threads, page_queue, concurrency, max_retries, transport)
+    raw_writer = RawThreadWriter()
+    store_writer = PartitionWriter(show, season, source, airing=airing(show, season))
+    pool = open_pool(n_workers, torch_threads) if n_workers > 1 else None
+    # Shared by every batch, so copypasta repeated across threads is caught too
+    comment_filter = CommentFilter()
+
+    scored_comments = 0
+    try:
+        for batch in iter_comment_batches(page_queue, raw_writer, batch_size):
+            # Raw files keep every comment; spam and near-duplicates are only kept out of scoring and the store
+            batch = comment_filter.apply(batch).reset_index(drop=True)
+            if batch.empty:
+                continue
+            if pool is not None:
+                mentions = pd.concat(list(iter_pool_mentions(pool, batch.comment, islanders)), ignore_index=True)
+            else:
+                mentions = batch_targeted_mentions(batch.comment, islanders)
+
+            with report.stage('reshape'):
+                scored = reshape_mentions(batch, mentions, episode_airdates)
+            with report.stage('parquet_write'):
+                store_writer.write(scored)
+            report.count('mention_rows', len(scored))
+            scored_comments += len(batch)
+            print(f"📝 Scored {scored_comments} comments so far")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    fetch_worker.join()
+
+    # Rows from threads that failed part-way are dropped; the thread is re-fetched on the next run
+    store_writer.discard_rows('episode_post_id', raw_writer.failed)
+    with report.stage('publish'):
+        written = store_writer.close()
+        # Only now are the threads ingested; their raw files take their final names last
+        raw_writer.publish()
+
+    report.count('failed_threads', len(raw_writer.failed))
+    report.write(f"{season_key(show, season)}_{source}", show=show, season=season, source=source,
+                 partitions=[p['path'] for p in written])
+    return written
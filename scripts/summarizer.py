@@ -1,22 +1,144 @@
 import streamlit as st
-from transformers import pipeline
 import os
+import json
+import time
+import fcntl
+import tempfile
+import threading
+import hashlib
+import datetime as dt
+from types import SimpleNamespace
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import google.generativeai as genai
-import pandas as pd
 
 # Load API Key
 load_dotenv()
 
 api_key = os.getenv('GEMINI_API_KEY')
 
+SUMMARY_MODEL = 'gemini-2.5-flash'
+SUMMARY_CACHE_PATH = "data/summaries/summary_cache.json"
+# Summaries older than this are evicted and regenerated on the next request
+SUMMARY_TTL = int(os.getenv("SUMMARY_TTL_HOURS", "72")) * 3600
+# Hard cap on Gemini calls per UTC day, shared by the daily job and the dashboard
+DAILY_CALL_LIMIT = int(os.getenv("SUMMARY_DAILY_LIMIT", "100"))
+# Entries kept at most; the oldest go first. Every prompt (islander x episode range) has its own entry.
+MAX_SUMMARIES = int(os.getenv("SUMMARY_MAX_ENTRIES", "2000"))
+
+# Streamlit sessions are threads of one process, and the daily job may run alongside the dashboard
+_cache_lock = threading.Lock()
+
+
+class StubSummarizer:
+    # Local stand-in for the Gemini client with the same generate_content(prompt).text interface
+    def generate_content(self, prompt):
+        header, _, text = prompt.partition("\n")
+        return SimpleNamespace(text=f"[stub] {header} {text[:200]}")
+
 
 @st.cache_resource
-def load_summarizer():
+def load_summarizer(backend=None):
+    # SUMMARIZER_BACKEND=stub skips the API entirely (local runs, CI without a key)
+    backend = backend or os.getenv("SUMMARIZER_BACKEND", "gemini")
+    if backend == 'stub':
+        return StubSummarizer()
     genai.configure(api_key=api_key)
-    return genai.GenerativeModel('gemini-2.5-flash')
+    return genai.GenerativeModel(SUMMARY_MODEL)
+
+
+class SummaryCache:
+    # Persistent summaries keyed by season (scope), islander, latest episode ingested and a hash of the prompt.
+    # Small enough to live in one JSON file. Every read-modify-write holds a thread and file lock, and
+    # writes go through a uniquely named tmp file + rename.
+    def __init__(self, path=SUMMARY_CACHE_PATH, ttl=SUMMARY_TTL, daily_limit=DAILY_CALL_LIMIT,
+                 max_entries=MAX_SUMMARIES):
+        self.path = path
+        self.ttl = ttl
+        self.daily_limit = daily_limit
+        self.max_entries = max_entries
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return {'summaries': {}, 'calls': {}}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, data):
+        with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(self.path) or ".", suffix=".tmp", delete=False) as f:
+            json.dump(data, f, indent=2)
+        os.replace(f.name, self.path)
+
+    @contextmanager
+    def locked(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with _cache_lock, open(f"{self.path}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def key(islander, latest_episode, prompt_hash, scope=None):
+        return f"{scope}|{islander}|{latest_episode}|{prompt_hash}"
+
+    @staticmethod
+    def today():
+        return dt.datetime.now(dt.timezone.utc).strftime('%Y-%m-%d')
+
+    def get(self, islander, latest_episode, prompt_hash, scope=None):
+        entry = self.load()['summaries'].get(self.key(islander, latest_episode, prompt_hash, scope))
+        if entry and time.time() - entry['created_at'] < self.ttl:
+            return entry['summary']
+        return None
+
+    def latest(self, islander, scope=None):
+        # Most recent summary for the islander in this season regardless of key, served once the daily budget is spent
+        entries = [
+            e for e in self.load()['summaries'].values()
+            if e['islander'] == islander and e.get('scope') == scope
+        ]
+        return max(entries, key=lambda e: e['created_at'])['summary'] if entries else None
+
+    def calls_today(self):
+        return self.load()['calls'].get(self.today(), 0)
+
+    def reserve_call(self):
+        # Checks and counts one API call in a single locked step, so concurrent sessions cannot overshoot the cap
+        with self.locked():
+            data = self.load()
+            calls = data['calls'].get(self.today(), 0)
+            if calls >= self.daily_limit:
+                return False
+            # Only today's counter matters for the budget
+            data['calls'] = {self.today(): calls + 1}
+            self.save(data)
+            return True
+
+    def put(self, islander, latest_episode, prompt_hash, summary, scope=None):
+        with self.locked():
+            data = self.load()
+            now = time.time()
+            fresh = [
+                (key, entry) for key, entry in data['summaries'].items()
+                if now - entry['created_at'] < self.ttl
+            ]
+            # Newest first, leaving room for the entry added below
+            fresh.sort(key=lambda item: item[1]['created_at'], reverse=True)
+            data['summaries'] = dict(fresh[:self.max_entries - 1])
+            data['summaries'][self.key(islander, latest_episode, prompt_hash, scope)] = {
+                'scope': scope,
+                'islander': islander,
+                'latest_episode': latest_episode,
+                'prompt_hash': prompt_hash,
+                'summary': summary,
+                'created_at': now
+            }
+            self.save(data)
 
 def prepare_text_for_summary(df, max_comments=50, max_chars=3000):
+    # Fed from the store's top-comment index, so this filters and sorts a few hundred rows at most
     # Ensure necessary columns are present
     if not {'comment', 'score'}.issubset(df.columns):
         raise ValueError("DataFrame must contain 'comment' and 'score' columns.")
@@ -27,7 +149,7 @@ def prepare_text_for_summary(df, max_comments=50, max_chars=3000):
     # Sort by upvotes (score) in descending order and limit
     top_comments = (
         filtered
-        .sort_values(by='score', ascending=False)
+        .sort_values(by='score', ascending=False, kind='stable')
         .head(max_comments)
     )
 
@@ -37,7 +159,11 @@ def prepare_text_for_summary(df, max_comments=50, max_chars=3000):
     return combined[:max_chars]
 
 
-def summarize_comments(comments, summarizer,selected_islander):
+def prompt_hash(prompt):
+    return hashlib.sha1(f"{SUMMARY_MODEL}\0{prompt}".encode("utf-8")).hexdigest()[:16]
+
+
+def summarize_comments(comments, summarizer,selected_islander, latest_episode=None, cache=None, scope=None):
     # Check for empty DataFrame
     if comments.empty:
         return "No comments available."
@@ -48,13 +174,37 @@ def summarize_comments(comments, summarizer,selected_islander):
     # Frame the prompt
     prompt = f"Summarize what people are saying about {selected_islander}:\n{text}"
 
+    if cache is not None:
+        key_hash = prompt_hash(prompt)
+        cached = cache.get(selected_islander, latest_episode, key_hash, scope)
+        if cached is not None:
+            return cached
+        if not cache.reserve_call():
+            latest = cache.latest(selected_islander, scope)
+            if latest is None:
+                return "Daily summary limit reached. Check back tomorrow."
+            return f"Daily summary limit reached. Showing the most recent summary, which may cover other episodes:\n\n{latest}"
+
     # Generate summary using Gemini
     try:
         response = summarizer.generate_content(prompt)
-        return response.text
     except Exception as e:
         return f"Error during summarization: {e}"
 
+    if cache is not None:
+        cache.put(selected_islander, latest_episode, key_hash, response.text, scope)
+    return response.text
+
+
+def pregenerate_summaries(comments, summarizer, cache, latest_episode, scope=None):
+    # comments: islander/comment/score rows. Run by the daily job so dashboard views are cache hits;
+    # islanders whose top comments did not change hash to the same key and cost nothing.
+    calls_before = cache.calls_today()
+    for islander, group in comments.groupby('islander', observed=True, sort=True):
+        summarize_comments(group[['comment', 'score']], summarizer, islander, latest_episode, cache, scope)
+    print(f"💬 Summaries ready for {comments['islander'].nunique()} islanders "
+          f"({cache.calls_today() - calls_before} API calls, {cache.calls_today()}/{cache.daily_limit} today)")
+
 
 def classify_sentiment(score):
   if score >= 0.05: